@@ -0,0 +1,218 @@
+"""Time-to-first-paint of the login page, and of the first login.
+
+Every new browser session runs my_lecture_dashboard.py top to bottom before
+the login page appears. Submitting the login form then checks the results log
+and opens the test page. These cases are timed, each over a fresh working
+directory seeded with --rows stored results:
+
+    cold        the first session in a new server process: module imports,
+                store initialization and the first script run
+    login_cold  the first login submit in that process
+    warm        a new session in a process that has already served one
+    login       a login submit in such a session
+    harness     a one-button script run the same way: AppTest's own
+                overhead, the floor under the warm figures
+
+Each cold sample is its own Python process, with streamlit already imported,
+as it is in a running server. The report also lists which heavy modules the
+login page, and then the first login, pulled in.
+
+    python benchmarks/bench_startup.py --json startup-before.json
+    python benchmarks/bench_startup.py --json startup-after.json --compare startup-before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+APP_FILE = os.path.join(REPO_DIR, 'my_lecture_dashboard.py')
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'pyarrow']
+
+
+HARNESS_SCRIPT = 'import streamlit as st\nst.button("Admin Login")'
+
+
+def first_paint(timeout, script=None):
+    from streamlit.testing.v1 import AppTest
+
+    if script is None:
+        at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    else:
+        at = AppTest.from_string(script, default_timeout=timeout)
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if not any(button.label == 'Admin Login' for button in at.button):
+        raise RuntimeError('login page did not render')
+    return elapsed
+
+
+# Times the run that submits the login form; the matric number is not in the log
+def login_submit(timeout, matric):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.run()
+    at.text_input[0].input('Startup Student')
+    at.text_input[1].input(matric)
+    next(button for button in at.button if button.label == 'Start Test').click()
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if not at.session_state.logged_in:
+        raise RuntimeError('login did not start the test')
+    return elapsed
+
+
+def heavy_modules_loaded():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+# Runs inside a fresh process whose working directory is a seeded store
+def run_case(warm, timeout):
+    cold = first_paint(timeout)
+    loaded = heavy_modules_loaded()
+    login_cold = login_submit(timeout, 'STARTUP0')
+    login_loaded = heavy_modules_loaded()
+    return {
+        'cold': cold,
+        'login_cold': login_cold,
+        'warm': [first_paint(timeout) for _ in range(warm)],
+        'login': [login_submit(timeout, f'STARTUP{i + 1}') for i in range(warm)],
+        'harness': [first_paint(timeout, HARNESS_SCRIPT) for _ in range(warm)],
+        'loaded': loaded,
+        'login_loaded': login_loaded
+    }
+
+
+# Seeds questions and `rows` results through the app itself. Only the parent
+# loads the app this way, so the cold samples still import it from scratch.
+def seed_store(workdir, backend, rows):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_storage import load_app_module, make_questions, seed_results
+
+    app = sys.modules.get('my_lecture_dashboard') or load_app_module()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        storage = app.open_storage(app.DEFAULT_TEST_ID, backend)
+        storage.save_questions(make_questions(20))
+        seed_results(app, storage, rows)
+    finally:
+        os.chdir(cwd)
+
+
+# numpy is only imported by the parent, so it cannot skew the cold samples
+def summarize(seconds):
+    import numpy as np
+
+    timings_ms = np.array(seconds) * 1000
+    return {
+        'calls': len(seconds),
+        'mean_ms': round(float(timings_ms.mean()), 1),
+        'p50_ms': round(float(np.percentile(timings_ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(timings_ms, 95)), 1),
+        'max_ms': round(float(timings_ms.max()), 1)
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', 'my_lecture_dashboard.py'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+
+def print_comparison(report, baseline):
+    print(f"{'case':<12} {'before p50':>12} {'after p50':>12} {'ratio':>8}", file=sys.stderr)
+    for key, after in report['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        ratio = after['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('nan')
+        print(f"{key:<12} {before['p50_ms']:>10.1f}ms {after['p50_ms']:>10.1f}ms {ratio:>7.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=5, help='cold samples, one process each')
+    parser.add_argument('--warm', type=int, default=20, help='warm sessions per process')
+    parser.add_argument('--backend', choices=['file', 'sqlite'], default='file')
+    parser.add_argument('--rows', type=int, default=1000, help='results already stored when students log in')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare p50 timings against')
+    parser.add_argument('--case', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        logging.disable(logging.WARNING)
+        json.dump(run_case(args.warm, args.timeout), sys.stdout)
+        return
+
+    logging.disable(logging.WARNING)
+    samples = {key: [] for key in ['cold', 'login_cold', 'warm', 'login', 'harness']}
+    loaded, login_loaded = set(), set()
+    for _ in range(args.processes):
+        workdir = tempfile.mkdtemp(prefix='lms-startup-')
+        try:
+            seed_store(workdir, args.backend, args.rows)
+            case = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--case',
+                 '--warm', str(args.warm), '--timeout', str(args.timeout)],
+                cwd=workdir, env=dict(os.environ, LMS_STORAGE_BACKEND=args.backend),
+                capture_output=True, text=True
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if case.returncode != 0:
+            sys.exit(f'startup case failed:\n{case.stderr}')
+        sample = json.loads(case.stdout)
+        for key in ['cold', 'login_cold']:
+            samples[key].append(sample[key])
+        for key in ['warm', 'login', 'harness']:
+            samples[key].extend(sample[key])
+        loaded.update(sample['loaded'])
+        login_loaded.update(sample['login_loaded'])
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'rows': args.rows
+        },
+        'results': {key: summarize(seconds) for key, seconds in samples.items()},
+        'modules_loaded': sorted(loaded),
+        'login_modules_loaded': sorted(login_loaded)
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
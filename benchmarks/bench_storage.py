@@ -0,0 +1,265 @@
+"""Micro-benchmarks for the storage hot paths at 1k, 10k and 100k rows.
+
+For every backend and size a fresh working directory is seeded with that many
+results rows, questions and in-progress students, then each operation is timed
+in its own cold Python process:
+
+    save_result, save_result_unique     one submission appended to N rows
+    has_taken_test_cold, has_taken_test first lookup after the index is dropped / later lookups
+    results_stats_cold, results_stats   the aggregates behind show_results_dashboard
+    check_results_stats                 full recomputation of those aggregates
+    load_questions_cold, load_questions bank of N questions, parsed / cached
+    save_progress, load_progress        one student's snapshot with N students in progress
+    record_answer, list_progress
+
+The report is JSON keyed "<backend>/<size>/<operation>" so two runs can be
+diffed directly; --compare prints the p50 ratio against an earlier report.
+With --archived the seeded results are moved into the columnar results archive
+before timing (file backend only, needs pyarrow) and reported as "file+archive".
+
+    python benchmarks/bench_storage.py --json bench-before.json
+    python benchmarks/bench_storage.py --json bench-after.json --compare bench-before.json
+    python benchmarks/bench_storage.py --sizes 1000,10000 --backends sqlite
+    python benchmarks/bench_storage.py --backends file --archived
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+APP_FILE = os.path.join(REPO_DIR, 'my_lecture_dashboard.py')
+OPTION_LABELS = ['A', 'B', 'C', 'D']
+PROGRESS_ANSWERS = 50
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location('my_lecture_dashboard', APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_questions(count):
+    return [
+        {
+            'id': i,
+            'question': f'Benchmark question {i}?',
+            'options': [f'Option {label}' for label in OPTION_LABELS],
+            'correct_answer': OPTION_LABELS[i % 4]
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def make_result_row(i):
+    return [
+        f'2024-01-{i % 28 + 1:02d} {i % 24:02d}:00:00',
+        f'Student {i}',
+        f'BENCH{i:07d}',
+        i % 21,
+        20,
+        round((i % 21) * 5.0, 2),
+        60 + i % 1800,
+        ''
+    ]
+
+
+def make_progress(i):
+    return {
+        'student_name': f'Student {i}',
+        'start_time': time.time(),
+        'answers': {str(q): OPTION_LABELS[(i + q) % 4] for q in range(1, PROGRESS_ANSWERS + 1)},
+        'test_started': True,
+        'test_duration': 1800
+    }
+
+
+# Seed storage in bulk; going through append_result would fsync once per row
+def seed_results(app, storage, size):
+    rows = [make_result_row(i) for i in range(size)]
+    if isinstance(storage, app.SQLiteStorage):
+        columns = list(app.RESULTS_SQL_COLUMNS.values())
+        with storage.transaction() as conn:
+            conn.executemany(
+                f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+    else:
+        with open(storage.results_file, 'a', newline='', encoding='utf-8') as f:
+            f.writelines(app.format_csv_row(row) for row in rows)
+
+
+def seed_progress(app, storage, size):
+    if isinstance(storage, app.SQLiteStorage):
+        with storage.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO progress (matric_number, data, updated_at) VALUES (?, ?, ?)",
+                ((f'BENCH{i:07d}', json.dumps(make_progress(i)), time.time()) for i in range(size))
+            )
+    else:
+        for i in range(size):
+            storage.save_progress(f'BENCH{i:07d}', make_progress(i))
+
+
+def measure(fn, calls):
+    timings = []
+    for i in range(calls):
+        started = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - started)
+    timings_us = np.array(timings) * 1e6
+    return {
+        'calls': calls,
+        'mean_us': round(float(timings_us.mean()), 1),
+        'p50_us': round(float(np.percentile(timings_us, 50)), 1),
+        'p95_us': round(float(np.percentile(timings_us, 95)), 1),
+        'max_us': round(float(timings_us.max()), 1)
+    }
+
+
+# Runs inside a fresh process whose working directory is the seeded store
+def run_case(size, ops, repeat, archived):
+    app = load_app_module()
+    test_id = app.DEFAULT_TEST_ID
+    storage = app.get_storage(test_id)
+    seed_results(app, storage, size)
+    seed_progress(app, storage, size)
+    app.save_questions(test_id, make_questions(size))
+    if archived:
+        app.compact_results(test_id, datetime.now().date())
+    app.invalidate_results_index(test_id)
+
+    def cold_index(i):
+        app.invalidate_results_index(test_id)
+        app.has_taken_test(test_id, 'BENCH0000000')
+
+    def cold_stats(i):
+        app.invalidate_results_index(test_id)
+        app.get_results_stats(test_id)
+
+    def cold_questions(i):
+        app.invalidate_question_bank(test_id)
+        app.load_questions(test_id)
+
+    # Cold paths first, while nothing is cached yet
+    report = {
+        'has_taken_test_cold': measure(cold_index, repeat),
+        'results_stats_cold': measure(cold_stats, repeat),
+        'load_questions_cold': measure(cold_questions, repeat),
+        'check_results_stats': measure(lambda i: app.check_results_stats(test_id), repeat),
+        'list_progress': measure(lambda i: storage.list_progress(), repeat)
+    }
+    report['has_taken_test'] = measure(
+        lambda i: app.has_taken_test(test_id, f'BENCH{(i * 7919) % (2 * size):07d}'), ops
+    )
+    report['results_stats'] = measure(lambda i: app.get_results_stats(test_id), ops)
+    report['load_questions'] = measure(lambda i: app.load_questions(test_id), ops)
+    report['save_progress'] = measure(
+        lambda i: storage.save_progress(f'BENCH{(i * 7919) % size:07d}', make_progress(i)), ops
+    )
+    report['record_answer'] = measure(
+        lambda i: storage.record_answer(f'BENCH{(i * 7919) % size:07d}', str(i % PROGRESS_ANSWERS + 1), 'A'), ops
+    )
+    report['load_progress'] = measure(lambda i: storage.load_progress(f'BENCH{(i * 7919) % size:07d}'), ops)
+    report['save_result'] = measure(
+        lambda i: app.save_result(test_id, f'New {i}', f'NEW{i:07d}', 10, 20, 50.0, 300), ops
+    )
+    report['save_result_unique'] = measure(
+        lambda i: app.save_result(test_id, f'Again {i}', f'AGAIN{i:07d}', 10, 20, 50.0, 300, unique=True), ops
+    )
+    return report
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', 'my_lecture_dashboard.py'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+
+def print_comparison(report, baseline):
+    print(f"{'case':<42} {'before p50':>12} {'after p50':>12} {'ratio':>8}", file=sys.stderr)
+    for key, after in report['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        ratio = after['p50_us'] / before['p50_us'] if before['p50_us'] else float('nan')
+        print(f"{key:<42} {before['p50_us']:>10.1f}us {after['p50_us']:>10.1f}us {ratio:>7.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--backends', default='file,sqlite')
+    parser.add_argument('--ops', type=int, default=200, help='calls per warm operation')
+    parser.add_argument('--repeat', type=int, default=5, help='calls per cold or full-scan operation')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--compare', help='earlier report to compare p50 timings against')
+    parser.add_argument('--archived', action='store_true', help='archive the seeded results first (file backend)')
+    parser.add_argument('--case', nargs=2, metavar=('BACKEND', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        logging.disable(logging.WARNING)
+        json.dump(run_case(int(args.case[1]), args.ops, args.repeat, args.archived), sys.stdout)
+        return
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'ops': args.ops,
+            'repeat': args.repeat
+        },
+        'results': {}
+    }
+    for backend in args.backends.split(','):
+        if args.archived and backend != 'file':
+            print(f'{backend}: no results archive, skipped', file=sys.stderr)
+            continue
+        label = 'file+archive' if args.archived else backend
+        for size in [int(size) for size in args.sizes.split(',')]:
+            workdir = tempfile.mkdtemp(prefix='lms-bench-')
+            try:
+                case = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--case', backend, str(size),
+                     '--ops', str(args.ops), '--repeat', str(args.repeat)] + (['--archived'] if args.archived else []),
+                    cwd=workdir, env=dict(os.environ, LMS_STORAGE_BACKEND=backend),
+                    capture_output=True, text=True
+                )
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            if case.returncode != 0:
+                sys.exit(f'{label}/{size} failed:\n{case.stderr}')
+            for operation, timing in json.loads(case.stdout).items():
+                report['results'][f'{label}/{size}/{operation}'] = timing
+            print(f'{label}/{size} done', file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
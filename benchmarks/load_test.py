@@ -0,0 +1,253 @@
+"""Concurrent-load harness: a class of simulated students taking the test.
+
+Each student is a headless Streamlit ``AppTest`` session (no browser, no
+network) driven through show_login -> answering every question in show_test
+-> submit_test. AppTest sessions cannot share a process safely, so students
+run concurrently in a pool of worker processes sharing one working directory.
+That is also how a multi-process deployment hits the results store.
+
+Reports p50/p95/p99 rerun latency, submission throughput, and rows that were
+lost, duplicated or recorded with the wrong score in the results store.
+
+Most of a rerun's latency here is AppTest itself: it rebuilds its runtime and
+recompiles the script on every run, where a server compiles it once. Each
+student therefore also times --harness-runs reruns of HARNESS_SCRIPT under the
+same load. The report gives that floor as harness_floor_ms, and app_rerun_ms
+as each rerun minus the floor's median.
+
+    python benchmarks/load_test.py --students 100 --concurrency 8
+    python benchmarks/load_test.py --students 200 --concurrency 8 --backend sqlite --json load.json
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'my_lecture_dashboard.py')
+OPTION_LABELS = ['A', 'B', 'C', 'D']
+
+# AppTest's cost per rerun without the app: a one-button script that also
+# turns the app into bytecode (parse, magic rewrite, compile), which AppTest
+# redoes on every run
+HARNESS_SCRIPT = (
+    'import streamlit as st\n'
+    'from streamlit.runtime.scriptrunner.script_cache import ScriptCache\n'
+    f'ScriptCache().get_bytecode({APP_FILE!r})\n'
+    'st.button("Start Test")\n'
+)
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location('my_lecture_dashboard', APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_questions(count):
+    return [
+        {
+            'id': i,
+            'question': f'Load test question {i}?',
+            'options': [f'Option {label}' for label in OPTION_LABELS],
+            'correct_answer': OPTION_LABELS[i % 4]
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+# Student k always picks option (k + question id) % 4, so the expected score
+# of every recorded row can be checked afterwards
+def expected_score(student, questions):
+    return sum(1 for q in questions if OPTION_LABELS[(student + q['id']) % 4] == q['correct_answer'])
+
+
+def timed_run(at, latencies, timeout):
+    started = time.perf_counter()
+    at.run(timeout=timeout)
+    latencies.append(time.perf_counter() - started)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def find_button(at, text):
+    for button in at.button:
+        if text in button.label:
+            return button
+    return None
+
+
+def harness_floor(runs, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    at = AppTest.from_string(HARNESS_SCRIPT, default_timeout=timeout)
+    for _ in range(runs):
+        timed_run(at, latencies, timeout)
+    return latencies
+
+
+def simulate_student(student, timeout, harness_runs):
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    timed_run(at, latencies, timeout)
+
+    at.text_input[0].input(f'Student {student}')
+    at.text_input[1].input(f'LOAD{student:05d}')
+    at.button[0].click()
+    timed_run(at, latencies, timeout)
+
+    # Answer the visible page one radio at a time, then move on
+    while True:
+        for i in range(len(at.radio)):
+            radio = at.radio[i]
+            q_id = int(radio.key[len('q_'):])
+            radio.set_value(radio.options[(student + q_id) % 4])
+            timed_run(at, latencies, timeout)
+        next_button = find_button(at, 'Next')
+        if next_button is None:
+            break
+        next_button.click()
+        timed_run(at, latencies, timeout)
+
+    find_button(at, 'Submit Test').click()
+    timed_run(at, latencies, timeout)
+    if not at.session_state.test_submitted:
+        confirm = find_button(at, 'Submit Anyway')
+        confirm.click()
+        timed_run(at, latencies, timeout)
+    return latencies, at.session_state.test_submitted, harness_floor(harness_runs, timeout)
+
+
+# Worker processes share the working directory and storage backend
+def init_worker(workdir, backend):
+    os.chdir(workdir)
+    os.environ['LMS_STORAGE_BACKEND'] = backend
+    logging.disable(logging.WARNING)
+
+
+def check_results(app, student_count, questions):
+    df = app.load_results(app.DEFAULT_TEST_ID)
+    matrics = df['Matric Number'].astype(str)
+    expected = {f'LOAD{k:05d}': expected_score(k, questions) for k in range(student_count)}
+
+    recorded = matrics[matrics.isin(expected)]
+    lost = len(set(expected) - set(recorded))
+    duplicated = int(recorded.duplicated().sum())
+    corrupted = int(df[RESULT_CHECK_COLUMNS].isna().any(axis=1).sum())
+    wrong_score = int(sum(
+        1 for matric, score in zip(df['Matric Number'].astype(str), df['Score'])
+        if matric in expected and score != expected[matric]
+    ))
+    return {'rows': len(df), 'lost': lost, 'duplicated': duplicated,
+            'corrupted': corrupted, 'wrong_score': wrong_score}
+
+
+RESULT_CHECK_COLUMNS = ['Timestamp', 'Student Name', 'Matric Number', 'Score',
+                        'Total Questions', 'Percentage', 'Time Taken (seconds)']
+
+
+def percentiles(timings_ms):
+    if not len(timings_ms):
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    return {
+        'p50': round(float(np.percentile(timings_ms, 50)), 2),
+        'p95': round(float(np.percentile(timings_ms, 95)), 2),
+        'p99': round(float(np.percentile(timings_ms, 99)), 2),
+        'max': round(float(np.max(timings_ms)), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 4,
+                        help='students taking the test at the same time (one worker process each)')
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--backend', choices=['file', 'sqlite'], default='file')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--harness-runs', type=int, default=3,
+                        help='reruns of the bare harness each student also times')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the working directory')
+    args = parser.parse_args()
+
+    os.environ['LMS_STORAGE_BACKEND'] = args.backend
+    workdir = tempfile.mkdtemp(prefix='lms-load-')
+    report_file = os.path.abspath(args.json) if args.json else None
+    os.chdir(workdir)
+    logging.disable(logging.WARNING)
+
+    app = load_app_module()
+    questions = make_questions(args.questions)
+    app.save_questions(app.DEFAULT_TEST_ID, questions)
+
+    # AppTest swaps out __main__ while a script runs, so workers must reach
+    # the harness functions through an importable module
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import load_test as harness
+
+    started = time.perf_counter()
+    latencies, floor, submitted, errors = [], [], 0, []
+    with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=harness.init_worker, initargs=(workdir, args.backend)) as pool:
+        futures = [pool.submit(harness.simulate_student, student, args.timeout, args.harness_runs)
+                   for student in range(args.students)]
+        for future in futures:
+            try:
+                student_latencies, ok, student_floor = future.result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.extend(student_latencies)
+            floor.extend(student_floor)
+            submitted += int(ok)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    floor_ms = np.array(floor) * 1000
+    floor_p50 = float(np.median(floor_ms)) if len(floor_ms) else 0.0
+    report = {
+        'students': args.students,
+        'concurrency': args.concurrency,
+        'questions': args.questions,
+        'backend': args.backend,
+        'wall_seconds': round(elapsed, 3),
+        'reruns': len(latencies),
+        'rerun_ms': percentiles(latencies_ms),
+        'harness_floor_ms': percentiles(floor_ms),
+        'app_rerun_ms': percentiles(np.clip(latencies_ms - floor_p50, 0, None)),
+        'submitted': submitted,
+        'submissions_per_second': round(submitted / elapsed, 2) if elapsed else None,
+        'errors': errors[:10],
+        'error_count': len(errors),
+        'results': check_results(app, args.students, questions)
+    }
+
+    print(json.dumps(report, indent=2))
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.keep:
+        print(f'Working directory kept at {workdir}', file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = report['results']
+    failed = errors or results['lost'] or results['duplicated'] or results['corrupted'] or results['wrong_score']
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,32 @@
 import streamlit as st
 import json
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import os
+import csv
+import io
+import shutil
+import importlib.util
+import logging
+import threading
+import sqlite3
+import heapq
+import functools
+import uuid
+import hashlib
+import cProfile
+import pstats
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
 
 # Page configuration
 st.set_page_config(
@@ -17,6 +40,37 @@ st.set_page_config(
 QUESTIONS_FILE = 'questions.json'
 RESULTS_FILE = 'test_results.csv'
 ADMIN_CREDENTIALS_FILE = 'admin_credentials.json'
+EXPORT_DIR = 'exports'
+
+DEFAULT_TEST_DURATION = 1800  # 30 minutes in seconds
+# Bounds of the duration a test can be given in the admin forms
+MIN_TEST_DURATION_MINUTES = 1
+MAX_TEST_DURATION_MINUTES = 600
+DEFAULT_TEST_ID = 'default'
+
+OPTION_LABELS = ['A', 'B', 'C', 'D']
+PASS_MARK = 50
+HISTOGRAM_BINS = 10
+
+# Item analysis flags: share answering correctly below/above which a question
+# is too hard/too easy, and the discrimination below which it is weak
+ITEM_HARD_P = 0.2
+ITEM_EASY_P = 0.9
+ITEM_LOW_DISCRIMINATION = 0.2
+
+RESULTS_COLUMNS = ['Timestamp', 'Student Name', 'Matric Number',
+                   'Score', 'Total Questions', 'Percentage', 'Time Taken (seconds)',
+                   'Answers']
+
+RESULTS_CHUNK_SIZE = 50000
+RESULTS_TABLE_COLUMNS = [column for column in RESULTS_COLUMNS if column != 'Answers']
+RESULTS_SORT_COLUMNS = ['Timestamp', 'Student Name', 'Matric Number', 'Score',
+                        'Percentage', 'Time Taken (seconds)']
+
+# Question file imports; CSV and Excel files have one column per option
+QUESTION_IMPORT_FORMATS = ['jsonl', 'csv', 'xlsx', 'json']
+QUESTION_OPTION_COLUMNS = [f"option_{label.lower()}" for label in OPTION_LABELS]
+IMPORT_ERRORS_SHOWN = 50
 
 # Initialize session state
 if 'logged_in' not in st.session_state:
@@ -36,7 +90,7 @@ if 'answers' not in st.session_state:
 if 'test_submitted' not in st.session_state:
     st.session_state.test_submitted = False
 if 'test_duration' not in st.session_state:
-    st.session_state.test_duration = 1800  # 30 minutes in seconds
+    st.session_state.test_duration = DEFAULT_TEST_DURATION
 if 'show_results_page' not in st.session_state:
     st.session_state.show_results_page = False
 if 'test_results_data' not in st.session_state:
@@ -47,95 +101,2660 @@ if 'confirm_submit' not in st.session_state:
     st.session_state.confirm_submit = False
 if 'answered_questions' not in st.session_state:
     st.session_state.answered_questions = 0
+if 'journal_entries' not in st.session_state:
+    st.session_state.journal_entries = 0
+if 'current_page' not in st.session_state:
+    st.session_state.current_page = 0
+if 'test_id' not in st.session_state:
+    st.session_state.test_id = DEFAULT_TEST_ID
+if 'perf_session_id' not in st.session_state:
+    st.session_state.perf_session_id = uuid.uuid4().hex
+if 'admission_ticket' not in st.session_state:
+    st.session_state.admission_ticket = None
+if 'waiting' not in st.session_state:
+    st.session_state.waiting = None
+
+PROGRESS_DIR = "progress"
+SQLITE_FILE = 'lms.db'
+# Idle SQLite connections each storage keeps open for reuse
+SQLITE_POOL_SIZE = 8
+
+# Results compacted out of the live log: typed Parquet parts partitioned by
+# day. The expiry sweeper archives results older than
+# RESULTS_ARCHIVE_AFTER_DAYS (None = only when an admin asks), looking every
+# RESULTS_ARCHIVE_CHECK_SECONDS.
+RESULTS_ARCHIVE_DIR = 'results_archive'
+RESULTS_ARCHIVE_AFTER_DAYS = 30
+RESULTS_ARCHIVE_CHECK_SECONDS = 3600
+RESULTS_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Bytes just before the indexed offset of the results log, re-checked before
+# indexing only the rows appended after it
+RESULTS_INDEX_FINGERPRINT = 64
+
+# Tests run side by side, each with its own questions, results and progress
+# under TESTS_DIR/<id>; the default test keeps the top-level files above.
+# Their definitions live in the shared configuration (CONFIG_FILE). Older
+# versions kept them under LEGACY_TESTS_DIR, which is also where the test
+# suite lives, and open_storage moves them across on first use.
+CONFIG_FILE = 'config.json'
+TESTS_DIR = 'test_data'
+LEGACY_TESTS_DIR = 'tests'
+TEST_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# Where questions, results, progress and credentials live: 'file' keeps the
+# JSON/CSV layout above, 'sqlite' keeps everything in SQLITE_FILE
+STORAGE_BACKEND = os.environ.get('LMS_STORAGE_BACKEND', 'file')
+
+DEFAULT_ADMIN = {'username': 'admin', 'password': 'admin123'}
+
+# Questions rendered per page of the test; 1 gives a single question with a
+# navigator grid, 0 renders the whole test on one page
+QUESTIONS_PER_PAGE = 10
+NAVIGATOR_COLUMNS = 10
+
+# Background sweeper that submits tests whose time ran out after the student
+# left. The grace period lets a still-open session submit itself first.
+EXPIRY_SWEEPER_ENABLED = True
+SWEEP_INTERVAL_SECONDS = 15
+EXPIRY_GRACE_SECONDS = 30
+
+# Seconds between ticks of the countdown fragment
+TIMER_REFRESH_SECONDS = 1
+
+# Test starts allowed in flight at once in each server process (0 = no limit).
+# Students over the limit wait in a queue that polls every
+# ADMISSION_POLL_SECONDS. A slot is freed by the student's first full test
+# page, or after ADMISSION_SLOT_SECONDS; a waiting tab that stops polling for
+# ADMISSION_QUEUE_TIMEOUT seconds loses its place.
+ADMISSION_LIMIT = int(os.environ.get('LMS_ADMISSION_LIMIT', '20'))
+ADMISSION_POLL_SECONDS = 2
+ADMISSION_SLOT_SECONDS = 30
+ADMISSION_QUEUE_TIMEOUT = 10
+
+# Seconds between refreshes of the admin live monitor, and without a saved
+# answer before a student is shown as idle
+LIVE_MONITOR_REFRESH_SECONDS = 5
+LIVE_IDLE_SECONDS = 300
+
+# Journal entries written before they are folded back into the snapshot
+PROGRESS_COMPACT_EVERY = 25
+
+# Defaults for each test's paper: QUESTIONS_PER_TEST questions drawn from the
+# bank (0 = the whole bank in bank order), optionally in proportion to each
+# tag's share of the bank, with options optionally shuffled. The draw is seeded
+# from PAPER_SEED, the test and the matric number, so it can be rebuilt at any
+# time; change PAPER_SEED to give everyone a fresh draw.
+QUESTIONS_PER_TEST = 0
+STRATIFY_BY_TAG = False
+PAPER_TAG_FIELD = 'tag'
+SHUFFLE_OPTIONS = False
+PAPER_SEED = 'lms'
+
+# Timings kept per instrumented function for the percentiles on the
+# Performance page, and the window behind "active" and "per second" figures
+PERF_SAMPLE_SIZE = 2000
+PERF_WINDOW_SECONDS = 60
+PROFILE_TOP_FUNCTIONS = 40
+
+# Everything shared by every session in this server process: timers, storage
+# shards, parsed question banks, the configuration, the expiry sweeper, the
+# admission queue and item analyses.
+# Built on the process's first script run and only looked up after that. One
+# cache_resource holds all of it because every decorated function costs an
+# inspect.getsource and an argument hash on each script run.
+@st.cache_resource(show_spinner=False)
+def get_process_state(backend):
+    return {
+        'lock': threading.Lock(),
+        'perf': {
+            'lock': threading.Lock(),
+            'timers': {},
+            'writes': deque(maxlen=100000),
+            'sessions': {},
+            'profile_requested': False,
+            'profile': None
+        },
+        'storage': {'lock': threading.Lock(), 'shards': {}},
+        'question_banks': {'lock': threading.Lock(), 'caches': {}},
+        'config': {'lock': threading.Lock(), 'version': None, 'config': None},
+        'sweeper': None,
+        'admission': {'lock': threading.Lock(), 'active': {}, 'queue': {}, 'expired_at': 0},
+        'item_analysis': {'lock': threading.Lock(), 'tests': {}}
+    }
+
+# Looked up once per script run into module globals, so that hot paths pay a
+# dict lookup rather than a cache lookup
+PROCESS_STATE = get_process_state(STORAGE_BACKEND)
+
+# Process-wide timers and counters, shared by every session
+PERF_REGISTRY = PROCESS_STATE['perf']
+
+def record_timing(name, seconds, write=False):
+    registry = PERF_REGISTRY
+    with registry['lock']:
+        timer = registry['timers'].get(name)
+        if timer is None:
+            timer = registry['timers'][name] = {
+                'count': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=PERF_SAMPLE_SIZE)
+            }
+        timer['count'] += 1
+        timer['total'] += seconds
+        timer['max'] = max(timer['max'], seconds)
+        timer['samples'].append(seconds)
+        if write:
+            registry['writes'].append(time.time())
+
+# Time every call of the decorated function under `name`; `write` also
+# counts it towards writes per second
+def instrumented(name, write=False):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_timing(name, time.perf_counter() - started, write)
+        return wrapper
+    return decorator
+
+def mark_session_active():
+    registry = PERF_REGISTRY
+    with registry['lock']:
+        registry['sessions'][st.session_state.perf_session_id] = time.time()
+
+def reset_perf_registry():
+    registry = PERF_REGISTRY
+    with registry['lock']:
+        registry['timers'].clear()
+        registry['writes'].clear()
+
+# Percentiles per function plus session and write rates, for the Performance page
+def get_perf_snapshot():
+    import numpy as np
+    import pandas as pd
+    
+    registry = PERF_REGISTRY
+    now = time.time()
+    with registry['lock']:
+        for session_id, last_seen in list(registry['sessions'].items()):
+            if now - last_seen > PERF_WINDOW_SECONDS:
+                del registry['sessions'][session_id]
+        timers = {
+            name: dict(timer, samples=np.array(timer['samples']) * 1000)
+            for name, timer in registry['timers'].items()
+        }
+        recent_writes = sum(1 for written in registry['writes'] if now - written <= PERF_WINDOW_SECONDS)
+        active_sessions = len(registry['sessions'])
+    
+    rows = [
+        {
+            'Function': name,
+            'Calls': timer['count'],
+            'Total (s)': round(timer['total'], 3),
+            'Mean (ms)': round(timer['total'] / timer['count'] * 1000, 2),
+            'p50 (ms)': round(float(np.percentile(timer['samples'], 50)), 2),
+            'p95 (ms)': round(float(np.percentile(timer['samples'], 95)), 2),
+            'p99 (ms)': round(float(np.percentile(timer['samples'], 99)), 2),
+            'Max (ms)': round(timer['max'] * 1000, 2)
+        }
+        for name, timer in sorted(timers.items())
+    ]
+    reruns = timers['main']['samples'] if 'main' in timers else np.array([])
+    return {
+        'functions': pd.DataFrame(rows),
+        'rerun_percentiles': [float(np.percentile(reruns, p)) for p in (50, 95, 99)] if len(reruns) else None,
+        'active_sessions': active_sessions,
+        'writes_per_second': recent_writes / PERF_WINDOW_SECONDS
+    }
+
+# Ask for the next rerun in any session to be profiled
+def request_profile():
+    registry = PERF_REGISTRY
+    with registry['lock']:
+        registry['profile_requested'] = True
+
+def take_profile_request():
+    registry = PERF_REGISTRY
+    with registry['lock']:
+        requested = registry['profile_requested']
+        registry['profile_requested'] = False
+        return requested
+
+# Run one rerun under cProfile and keep the report for the Performance page
+def run_profiled(fn):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        fn()
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        registry = PERF_REGISTRY
+        with registry['lock']:
+            registry['profile'] = {
+                'captured_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'report': output.getvalue()
+            }
+
+# Exclusive lock shared by every process writing to `path`
+@contextmanager
+def file_lock(path):
+    with open(path, 'a+b') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def format_csv_row(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(values)
+    return buffer.getvalue()
+
+# A last line that parses as a full results row, i.e. was not cut off mid-write
+def is_complete_results_row(data):
+    try:
+        rows = list(csv.reader(io.StringIO(data.decode('utf-8')), strict=True))
+    except (UnicodeDecodeError, csv.Error):
+        return False
+    return len(rows) == 1 and len(rows[0]) >= len(RESULTS_COLUMNS)
+
+# A last line that parses as a full progress journal entry
+def is_complete_journal_entry(data):
+    try:
+        entry = json.loads(data)
+    except ValueError:
+        return False
+    return isinstance(entry, dict) and 'q' in entry and 'a' in entry
+
+# Make sure the next append starts on a clean line. A row left half-written by
+# a crash is dropped; a complete last row that only lacks its newline (a
+# hand-edited file) is kept and given one.
+def truncate_partial_row(f, is_complete=is_complete_results_row):
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return
+    f.seek(end - 1)
+    if f.read(1) == b'\n':
+        return
+    start = 0
+    pos = end
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        newline = f.read(step).rfind(b'\n')
+        if newline != -1:
+            start = pos + newline + 1
+            break
+    f.seek(start)
+    if is_complete(f.read(end - start)):
+        f.write(b'\n')
+    else:
+        f.truncate(start)
+
+def file_signature(stat):
+    return (stat.st_mtime_ns, stat.st_size)
+
+def empty_results_stats():
+    return {
+        'count': 0,
+        'percentage_sum': 0.0,
+        'percentage_count': 0,
+        'time_sum': 0.0,
+        'time_count': 0,
+        'histogram': [0] * 101
+    }
+
+def parse_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+# Fold one result row into the running aggregates. The histogram counts
+# results per whole percent, so pass counts work for any whole-number pass mark.
+def add_to_results_stats(stats, percentage, time_taken):
+    stats['count'] += 1
+    percentage = parse_number(percentage)
+    if percentage is not None:
+        stats['percentage_sum'] += percentage
+        stats['percentage_count'] += 1
+        stats['histogram'][min(max(int(percentage), 0), 100)] += 1
+    time_taken = parse_number(time_taken)
+    if time_taken is not None:
+        stats['time_sum'] += time_taken
+        stats['time_count'] += 1
+
+# add_to_results_stats for whole numeric columns at once; NaN is missing
+def add_columns_to_results_stats(stats, percentages, times):
+    import numpy as np
+    
+    percentages = np.asarray(percentages, dtype=float)
+    times = np.asarray(times, dtype=float)
+    stats['count'] += len(percentages)
+    percentages = percentages[~np.isnan(percentages)]
+    stats['percentage_sum'] += float(percentages.sum())
+    stats['percentage_count'] += len(percentages)
+    histogram = np.bincount(np.clip(percentages, 0, 100).astype(int), minlength=101)
+    stats['histogram'] = [a + int(b) for a, b in zip(stats['histogram'], histogram)]
+    times = times[~np.isnan(times)]
+    stats['time_sum'] += float(times.sum())
+    stats['time_count'] += len(times)
+
+# What the live monitor shows for one in-progress test
+def summarize_progress(matric, data, updated_at):
+    return {
+        'matric': matric,
+        'student_name': data.get('student_name') or matric,
+        'start_time': data.get('start_time'),
+        'test_duration': data.get('test_duration', DEFAULT_TEST_DURATION),
+        'answered': sum(1 for answer in data.get('answers', {}).values() if answer),
+        'updated_at': updated_at
+    }
+
+def copy_results_stats(stats):
+    stats = dict(stats)
+    stats['histogram'] = list(stats['histogram'])
+    return stats
+
+def count_passes(stats, pass_mark):
+    import numpy as np
+    
+    return sum(stats['histogram'][min(max(int(np.ceil(pass_mark)), 0), 101):])
+
+# The per-percent histogram folded into HISTOGRAM_BINS bands for the dashboard
+def score_bands(stats):
+    width = 100 // HISTOGRAM_BINS
+    bands = [sum(stats['histogram'][i * width:(i + 1) * width]) for i in range(HISTOGRAM_BINS)]
+    bands[-1] += sum(stats['histogram'][HISTOGRAM_BINS * width:])
+    return bands
+
+# Interface every storage backend implements. Backend instances are shared by
+# all sessions of the process (see get_storage), so they must be thread-safe.
+# A backend missing an abstract method fails when it is created; the others
+# have defaults that suit a backend without a results index or archive.
+class Storage(ABC):
+    @abstractmethod
+    def initialize(self):
+        raise NotImplementedError
+    
+    # Questions
+    @abstractmethod
+    def questions_version(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def load_questions(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def save_questions(self, questions):
+        raise NotImplementedError
+    
+    # Replace questions with the same id and append the rest; returns (added, updated)
+    @abstractmethod
+    def merge_questions(self, questions):
+        raise NotImplementedError
+    
+    # Shared configuration (test definitions and their settings), kept in the
+    # default test's storage; the version changes whenever it is saved
+    @abstractmethod
+    def config_version(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def load_config(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def save_config(self, config):
+        raise NotImplementedError
+    
+    # Admin credentials
+    @abstractmethod
+    def load_admin_credentials(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def save_admin_credentials(self, credentials):
+        raise NotImplementedError
+    
+    # In-progress tests
+    @abstractmethod
+    def save_progress(self, matric, data):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def record_answer(self, matric, q_id, answer):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def load_progress(self, matric):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def clear_progress(self, matric):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def list_progress(self):
+        raise NotImplementedError
+    
+    # summarize_progress() of every test in progress, for the live monitor
+    @abstractmethod
+    def progress_summaries(self):
+        raise NotImplementedError
+    
+    # Results; rows are lists in RESULTS_COLUMNS order
+    @abstractmethod
+    def results_version(self):
+        raise NotImplementedError
+    
+    # With `unique`, nothing is written if the matric number already has a
+    # result; returns whether the row was written
+    @abstractmethod
+    def append_result(self, row, unique=False):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def has_taken_test(self, matric):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def results_stats(self):
+        raise NotImplementedError
+    
+    def invalidate_results_index(self):
+        pass
+    
+    @abstractmethod
+    def load_results(self):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def iter_results_chunks(self, columns=None, chunksize=RESULTS_CHUNK_SIZE):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def query_results(self, filters, sort_by, ascending, page, page_size):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def update_scores(self, grade):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def clear_results(self):
+        raise NotImplementedError
+    
+    # Move results submitted before `before` (a date) out of the live log into
+    # the columnar archive; returns how many rows moved
+    @abstractmethod
+    def compact_results(self, before):
+        raise NotImplementedError
+    
+    # Archived results per day: date, parts, rows and bytes on disk
+    def archive_partitions(self):
+        return []
+
+# Results filters shared by both backends
+def parse_results_filters(filters):
+    score_min, score_max = filters.get('score_band', (0, 100))
+    return {
+        'matric': filters.get('matric', '').strip(),
+        'name': filters.get('name', '').strip().lower(),
+        'date_from': filters.get('date_from'),
+        'date_to': filters.get('date_to'),
+        'score_min': score_min,
+        'score_max': score_max
+    }
+
+def has_results_filters(f):
+    return bool(f['matric'] or f['name'] or f['date_from'] or f['date_to']
+                or f['score_min'] > 0 or f['score_max'] < 100)
+
+# Arrow type of each archived results column
+def results_archive_schema():
+    import pyarrow as pa
+    
+    return pa.schema([
+        ('Timestamp', pa.timestamp('s')),
+        ('Student Name', pa.string()),
+        ('Matric Number', pa.string()),
+        ('Score', pa.int32()),
+        ('Total Questions', pa.int32()),
+        ('Percentage', pa.float64()),
+        ('Time Taken (seconds)', pa.int32()),
+        ('Answers', pa.string())
+    ])
+
+# Results rows from the live log as typed columns
+def to_archive_frame(df):
+    import pandas as pd
+    
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(df['Timestamp'], format=RESULTS_TIME_FORMAT, errors='coerce'),
+        'Student Name': df['Student Name'],
+        'Matric Number': df['Matric Number'],
+        'Score': pd.to_numeric(df['Score'], errors='coerce'),
+        'Total Questions': pd.to_numeric(df['Total Questions'], errors='coerce'),
+        'Percentage': pd.to_numeric(df['Percentage'], errors='coerce'),
+        'Time Taken (seconds)': pd.to_numeric(df['Time Taken (seconds)'], errors='coerce').round(),
+        'Answers': df['Answers']
+    })
+
+# Archived rows as the rest of the app sees rows from the live log
+def from_archive_table(table):
+    df = table.to_pandas()
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = df['Timestamp'].dt.strftime(RESULTS_TIME_FORMAT)
+    return df
+
+# Results compacted out of the live log: typed Parquet parts, one per day and
+# compaction run, under <directory>/date=YYYY-MM-DD/, read with column
+# projection and memory mapping. manifest.json lists the parts in log order
+# and is the commit point of every change; files it does not list are ignored.
+class ResultsArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, 'manifest.json')
+        self.cache = {'lock': threading.Lock(), 'signature': None, 'manifest': {'parts': []}}
+    
+    def version(self):
+        try:
+            return file_signature(os.stat(self.manifest_file))
+        except FileNotFoundError:
+            return None
+    
+    def manifest(self):
+        signature = self.version()
+        with self.cache['lock']:
+            if signature != self.cache['signature']:
+                manifest = {'parts': []}
+                if signature is not None:
+                    with open(self.manifest_file, 'r') as f:
+                        manifest = json.load(f)
+                self.cache['manifest'] = manifest
+                self.cache['signature'] = signature
+            return self.cache['manifest']
+    
+    def parts(self):
+        return self.manifest()['parts']
+    
+    # Caller must hold the results lock
+    def write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_file)
+    
+    # Write typed rows of one day to a new part, invisible until a manifest lists it
+    def write_part(self, day, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        name = f"date={day}/part-{uuid.uuid4().hex[:12]}.parquet"
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(frame, schema=results_archive_schema(), preserve_index=False)
+        pq.write_table(table, path + '.tmp')
+        with open(path + '.tmp', 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        return {'file': name, 'date': day, 'rows': len(frame)}
+    
+    # One new part per day of `df`, in log order
+    def write_parts(self, df):
+        frame = to_archive_frame(df)
+        days = frame['Timestamp'].dt.strftime('%Y-%m-%d')
+        return [self.write_part(day, rows) for day, rows in frame.groupby(days, sort=True)]
+    
+    def remove_parts(self, parts):
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.directory, part['file']))
+            except OSError:
+                pass
+    
+    def read_part(self, part, columns=None):
+        import pyarrow.parquet as pq
+        
+        return pq.read_table(os.path.join(self.directory, part['file']), columns=columns, memory_map=True)
+    
+    # DataFrames of `parts` in log order, indexed by row position in the
+    # archive; days outside [date_from, date_to] are skipped unread
+    def iter_frames(self, parts, columns=None, date_from=None, date_to=None):
+        offset = 0
+        for part in parts:
+            if not ((date_from and part['date'] < date_from) or (date_to and part['date'] > date_to)):
+                df = from_archive_table(self.read_part(part, columns))
+                df.index = range(offset, offset + len(df))
+                yield df
+            offset += part['rows']
+    
+    # Rows at the given archive positions, indexed by position; only the parts
+    # holding them are read
+    def take(self, parts, positions, columns=None):
+        import pandas as pd
+        
+        wanted = sorted(set(positions))
+        frames = []
+        offset = 0
+        for part in parts:
+            in_part = [p - offset for p in wanted if offset <= p < offset + part['rows']]
+            if in_part:
+                df = from_archive_table(self.read_part(part, columns).take(in_part))
+                df.index = [p + offset for p in in_part]
+                frames.append(df)
+            offset += part['rows']
+        return pd.concat(frames) if frames else pd.DataFrame(columns=columns or RESULTS_COLUMNS)
+    
+    # Submitted matric numbers and aggregates of `parts`, from three columns
+    # read in one multi-file scan, straight from Arrow
+    def summarize(self, parts):
+        stats = empty_results_stats()
+        if not parts:
+            return set(), stats
+        # Only reached with archived parts, so installs without pyarrow never
+        # import it
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        
+        paths = [os.path.join(self.directory, part['file']) for part in parts]
+        table = ds.dataset(paths, schema=results_archive_schema(), format='parquet').to_table(
+            columns=['Matric Number', 'Percentage', 'Time Taken (seconds)']
+        )
+        matrics = set(pc.unique(table['Matric Number'].drop_null()).to_pylist())
+        add_columns_to_results_stats(stats, table['Percentage'].to_numpy(), table['Time Taken (seconds)'].to_numpy())
+        return matrics, stats
+    
+    # Re-score archived answer sheets with `grade(sheets)`; changed parts are
+    # rewritten and swapped in by one manifest write. Caller must hold the
+    # results lock.
+    def update_scores(self, grade):
+        import numpy as np
+        
+        manifest = self.manifest()
+        parts, replaced = [], []
+        regraded = changed = 0
+        for part in manifest['parts']:
+            df = self.read_part(part).to_pandas()
+            has_sheet = df['Answers'].notna() & (df['Answers'] != '')
+            if not has_sheet.any():
+                parts.append(part)
+                continue
+            scores, totals, percentages = grade([json.loads(sheet) for sheet in df.loc[has_sheet, 'Answers']])
+            percentages = np.round(percentages, 2)
+            regraded += int(has_sheet.sum())
+            changed += int((df.loc[has_sheet, 'Score'].to_numpy() != scores).sum())
+            if ((df.loc[has_sheet, 'Score'].to_numpy() == scores).all()
+                    and (df.loc[has_sheet, 'Total Questions'].to_numpy() == totals).all()
+                    and (df.loc[has_sheet, 'Percentage'].to_numpy() == percentages).all()):
+                parts.append(part)
+                continue
+            df.loc[has_sheet, 'Score'] = scores.astype(df['Score'].dtype)
+            df.loc[has_sheet, 'Total Questions'] = totals.astype(df['Total Questions'].dtype)
+            df.loc[has_sheet, 'Percentage'] = percentages
+            parts.append(self.write_part(part['date'], df))
+            replaced.append(part)
+        
+        if replaced:
+            self.write_manifest(dict(manifest, parts=parts))
+            self.remove_parts(replaced)
+        return regraded, changed
+    
+    # Drop every part, including any a crashed compaction left unlisted.
+    # Caller must hold the results lock.
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        self.write_manifest({'parts': []})
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name.startswith('date='):
+                shutil.rmtree(entry.path, ignore_errors=True)
+    
+    def partitions(self):
+        days = {}
+        for part in self.parts():
+            day = days.setdefault(part['date'], {'date': part['date'], 'parts': 0, 'rows': 0, 'bytes': 0})
+            day['parts'] += 1
+            day['rows'] += part['rows']
+            try:
+                day['bytes'] += os.path.getsize(os.path.join(self.directory, part['file']))
+            except OSError:
+                pass
+        return list(days.values())
+
+# The original layout: questions.json, test_results.csv, progress/ and
+# admin_credentials.json, plus the compacted results archive
+class FileStorage(Storage):
+    def __init__(self, questions_file, results_file, progress_dir, credentials_file, config_file, archive_dir):
+        self.questions_file = questions_file
+        self.results_file = results_file
+        self.results_lock_file = results_file + '.lock'
+        self.compacted_file = results_file + '.compacted'
+        self.progress_dir = progress_dir
+        self.credentials_file = credentials_file
+        self.config_file = config_file
+        self.archive = ResultsArchive(archive_dir)
+        # Submitted matric numbers and running aggregates, keyed on the live
+        # log's (mtime, size) and the archive's version. The archive's share
+        # is kept apart so a change to the live log does not re-read it.
+        # offset is how far the log has been indexed, for picking up rows
+        # other processes append; None when the log ended mid-row.
+        self.results_index = {
+            'lock': threading.Lock(),
+            'signature': None,
+            'matrics': set(),
+            'stats': empty_results_stats(),
+            'columns': None,
+            'inode': None,
+            'offset': None,
+            'fingerprint': b'',
+            'archive_version': None,
+            'archive_matrics': None,
+            'archive_stats': None
+        }
+        # Parsed progress per matric number, keyed on the snapshot's signature
+        # and how far into the journal it has been read
+        self.progress_index = {'lock': threading.Lock(), 'sessions': {}}
+    
+    def initialize(self):
+        os.makedirs(self.progress_dir, exist_ok=True)
+        
+        # Questions file
+        if not os.path.exists(self.questions_file):
+            with open(self.questions_file, 'w') as f:
+                json.dump([], f)
+        
+        # Results file
+        if self.archive.manifest().get('pending_live'):
+            with file_lock(self.results_lock_file):
+                self.finish_compaction()
+        if not os.path.exists(self.results_file):
+            self.reset_results_file()
+        else:
+            self.upgrade_results_file()
+        
+        # Admin credentials
+        if not os.path.exists(self.credentials_file):
+            with open(self.credentials_file, 'w') as f:
+                json.dump(DEFAULT_ADMIN, f)
+    
+    # Questions
+    def questions_version(self):
+        try:
+            return file_signature(os.stat(self.questions_file))
+        except OSError:
+            return None
+    
+    def load_questions(self):
+        with open(self.questions_file, 'r') as f:
+            return json.load(f)
+    
+    def save_questions(self, questions):
+        with file_lock(self.questions_file + '.lock'):
+            self.write_questions(questions)
+    
+    # Atomically replace the questions file; caller must hold the questions lock
+    def write_questions(self, questions):
+        tmp_file = f"{self.questions_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(questions, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.questions_file)
+    
+    def merge_questions(self, questions):
+        with file_lock(self.questions_file + '.lock'):
+            merged, added, updated = merge_question_lists(self.load_questions(), questions)
+            self.write_questions(merged)
+        return added, updated
+    
+    # Configuration
+    def config_version(self):
+        try:
+            return file_signature(os.stat(self.config_file))
+        except OSError:
+            return None
+    
+    def load_config(self):
+        try:
+            with open(self.config_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def save_config(self, config):
+        with file_lock(self.config_file + '.lock'):
+            tmp_file = f"{self.config_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+    
+    # Admin credentials
+    def load_admin_credentials(self):
+        try:
+            with open(self.credentials_file, 'r') as f:
+                return json.load(f)
+        except:
+            return dict(DEFAULT_ADMIN)
+    
+    def save_admin_credentials(self, credentials):
+        tmp_file = self.credentials_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(credentials, f)
+        os.replace(tmp_file, self.credentials_file)
+    
+    # In-progress tests: a snapshot plus an append-only journal of answer changes
+    def get_progress_file(self, matric):
+        return os.path.join(self.progress_dir, f"progress_{matric}.json")
+    
+    def get_progress_journal(self, matric):
+        return os.path.join(self.progress_dir, f"progress_{matric}.jsonl")
+    
+    # Write a full snapshot and drop the journal it supersedes
+    def save_progress(self, matric, data):
+        file = self.get_progress_file(matric)
+        tmp_file = file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, file)
+        
+        journal = self.get_progress_journal(matric)
+        if os.path.exists(journal):
+            os.remove(journal)
+    
+    # Appended after any entry a crash left half-written, which would
+    # otherwise swallow this one when the journal is replayed
+    def record_answer(self, matric, q_id, answer):
+        with open(self.get_progress_journal(matric), "a+b") as f:
+            truncate_partial_row(f, is_complete_journal_entry)
+            f.write((json.dumps({"q": q_id, "a": answer}) + "\n").encode("utf-8"))
+    
+    def load_progress(self, matric):
+        file = self.get_progress_file(matric)
+        if not os.path.exists(file):
+            return None
+        with open(file, "r") as f:
+            data = json.load(f)
+        
+        journal = self.get_progress_journal(matric)
+        if os.path.exists(journal):
+            with open(journal, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Partial line from an interrupted write
+                        continue
+                    data["answers"][entry["q"]] = entry["a"]
+        return data
+    
+    def clear_progress(self, matric):
+        for file in (self.get_progress_journal(matric), self.get_progress_file(matric)):
+            if os.path.exists(file):
+                os.remove(file)
+    
+    # Matric numbers with a test in progress, from file names alone
+    def list_progress(self):
+        return [
+            name[len("progress_"):-len(".json")]
+            for name in os.listdir(self.progress_dir)
+            if name.startswith("progress_") and name.endswith(".json")
+        ]
+    
+    # One directory scan per call; a student's files are only read again when
+    # the snapshot changed, and a growing journal is read from where the last
+    # call stopped
+    def progress_summaries(self):
+        files = {}
+        for entry in os.scandir(self.progress_dir):
+            if not entry.name.startswith("progress_"):
+                continue
+            try:
+                if entry.name.endswith(".json"):
+                    files.setdefault(entry.name[len("progress_"):-len(".json")], [None, None])[0] = entry.stat()
+                elif entry.name.endswith(".jsonl"):
+                    files.setdefault(entry.name[len("progress_"):-len(".jsonl")], [None, None])[1] = entry.stat()
+            except FileNotFoundError:
+                continue
+        
+        index = self.progress_index
+        with index['lock']:
+            sessions = {}
+            for matric, (snapshot, journal) in files.items():
+                if snapshot is None:
+                    continue
+                session = index['sessions'].get(matric)
+                journal_size = journal.st_size if journal else 0
+                try:
+                    if (session is None or session['snapshot'] != file_signature(snapshot)
+                            or journal_size < session['journal_offset']):
+                        session = self.read_progress_snapshot(matric, snapshot)
+                    if journal_size > session['journal_offset']:
+                        self.read_progress_journal(matric, session)
+                except (OSError, ValueError):
+                    # Replaced while we read it; the next call picks it up
+                    continue
+                updated_at = max(snapshot.st_mtime, journal.st_mtime if journal else 0)
+                session['summary'] = summarize_progress(matric, session['data'], updated_at)
+                sessions[matric] = session
+            index['sessions'] = sessions
+            return [session['summary'] for session in sessions.values()]
+    
+    def read_progress_snapshot(self, matric, stat):
+        with open(self.get_progress_file(matric), "r") as f:
+            data = json.load(f)
+        return {'snapshot': file_signature(stat), 'journal_offset': 0, 'data': data}
+    
+    # Apply the complete journal lines written since the last read
+    def read_progress_journal(self, matric, session):
+        with open(self.get_progress_journal(matric), "rb") as f:
+            f.seek(session['journal_offset'])
+            chunk = f.read()
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            session['data']["answers"][entry["q"]] = entry["a"]
+        session['journal_offset'] += len(complete)
+    
+    # Results
+    def results_version(self):
+        stat = os.stat(self.live_results_file())
+        version = f"{stat.st_mtime_ns}_{stat.st_size}"
+        archive_version = self.archive.version()
+        if archive_version:
+            version += f"_{archive_version[0]}_{archive_version[1]}"
+        return version
+    
+    # The live log: results_file, except between a compaction's commit and its
+    # swap, when the compacted copy already holds exactly the rows still live
+    def live_results_file(self):
+        if self.archive.manifest().get('pending_live') and os.path.exists(self.compacted_file):
+            return self.compacted_file
+        return self.results_file
+    
+    # Complete a compaction interrupted after its commit; caller must hold the results lock
+    def finish_compaction(self):
+        manifest = self.archive.manifest()
+        if not manifest.get('pending_live'):
+            return
+        if os.path.exists(self.compacted_file):
+            os.replace(self.compacted_file, self.results_file)
+        self.archive.write_manifest({key: value for key, value in manifest.items() if key != 'pending_live'})
+    
+    def compact_results(self, before):
+        if not self.has_live_rows_before(before):
+            return 0
+        return self.compact_live_results(before)
+    
+    # Roll the live rows stamped before `before` into new archive parts. The
+    # manifest write is the commit point: it lists the new parts and marks the
+    # compacted copy of the log as live until it replaces results_file.
+    def compact_live_results(self, before):
+        import pandas as pd
+        
+        with file_lock(self.results_lock_file):
+            self.finish_compaction()
+            df = self.load_live_results()
+            stamped = pd.to_datetime(df['Timestamp'], format=RESULTS_TIME_FORMAT, errors='coerce')
+            old = (stamped < pd.Timestamp(before)).to_numpy()
+            if not old.any():
+                return 0
+            
+            new_parts = self.archive.write_parts(df[old])
+            df[~old].to_csv(self.compacted_file, index=False, lineterminator='\n')
+            with open(self.compacted_file, 'rb') as f:
+                os.fsync(f.fileno())
+            manifest = self.archive.manifest()
+            parts = sorted(manifest['parts'] + new_parts, key=lambda part: part['date'])
+            self.archive.write_manifest(dict(manifest, parts=parts, pending_live=True))
+            self.finish_compaction()
+        return int(old.sum())
+    
+    # Whether the live log may hold rows stamped before `before`. The log is in
+    # time order, so only its first row is read, without pandas or the lock.
+    def has_live_rows_before(self, before):
+        try:
+            with open(self.live_results_file(), newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                row = next(reader, None)
+        except FileNotFoundError:
+            return False
+        if not row:
+            return False
+        try:
+            return datetime.strptime(row[0], RESULTS_TIME_FORMAT).date() < before
+        except ValueError:
+            return True
+    
+    def archive_partitions(self):
+        return self.archive.partitions()
+    
+    # Write a fresh results log containing only the header
+    def reset_results_file(self):
+        with file_lock(self.results_lock_file):
+            tmp_file = self.results_file + '.tmp'
+            with open(tmp_file, 'w', newline='') as f:
+                f.write(format_csv_row(RESULTS_COLUMNS))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.results_file)
+    
+    # Replace the results log with `df`; caller must hold the results lock
+    def write_results_frame(self, df):
+        tmp_file = self.results_file + '.tmp'
+        df.to_csv(tmp_file, index=False, lineterminator='\n')
+        with open(tmp_file, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.results_file)
+    
+    # Add columns introduced after the results log was created
+    def upgrade_results_file(self):
+        with open(self.results_file, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), None)
+        if not header or all(column in header for column in RESULTS_COLUMNS):
+            return
+        
+        with file_lock(self.results_lock_file):
+            df = self.load_live_results()
+            for column in RESULTS_COLUMNS:
+                if column not in df.columns:
+                    df[column] = ''
+            extra = [column for column in df.columns if column not in RESULTS_COLUMNS]
+            self.write_results_frame(df[RESULTS_COLUMNS + extra])
+    
+    # One locked append per submission: O(1) regardless of how many rows exist
+    def append_result(self, row, unique=False):
+        line = format_csv_row(row).encode('utf-8')
+        with file_lock(self.results_lock_file):
+            self.finish_compaction()
+            if unique:
+                with self.results_index['lock']:
+                    self.refresh_results_index()
+                    if str(row[2]) in self.results_index['matrics']:
+                        return False
+            with open(self.results_file, 'a+b') as f:
+                truncate_partial_row(f)
+                if f.tell() == 0:
+                    f.write(format_csv_row(RESULTS_COLUMNS).encode('utf-8'))
+                before = os.fstat(f.fileno())
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                after = os.fstat(f.fileno())
+            archive_version = self.archive.version()
+        
+        # Keep the index current after our own append instead of rescanning the file
+        index = self.results_index
+        with index['lock']:
+            if index['signature'] == (file_signature(before), archive_version):
+                index['matrics'].add(str(row[2]))
+                add_to_results_stats(index['stats'], row[5], row[6])
+                index['signature'] = (file_signature(after), archive_version)
+                if index['offset'] is not None:
+                    index['offset'] = after.st_size
+                    index['fingerprint'] = (index['fingerprint'] + line)[-RESULTS_INDEX_FINGERPRINT:]
+        return True
+    
+    # Bring the index up to date with the results. Rows other processes
+    # appended are indexed from the last indexed offset; the log is only
+    # rescanned when it was rewritten, and the archive only re-read when its
+    # manifest changed. Caller must hold the index lock.
+    def refresh_results_index(self):
+        index = self.results_index
+        archive_version = self.archive.version()
+        live_file = self.live_results_file()
+        try:
+            stat = os.stat(live_file)
+        except FileNotFoundError:
+            index['signature'] = None
+            index['matrics'] = set()
+            index['stats'] = empty_results_stats()
+            index['offset'] = None
+            return
+        signature = (file_signature(stat), archive_version)
+        if signature == index['signature']:
+            return
+        if self.extend_results_index(live_file, stat, archive_version):
+            index['signature'] = signature
+            return
+        
+        if index['archive_matrics'] is None or index['archive_version'] != archive_version:
+            index['archive_matrics'], index['archive_stats'] = self.archive.summarize(self.archive.parts())
+            index['archive_version'] = archive_version
+        matrics = set(index['archive_matrics'])
+        stats = copy_results_stats(index['archive_stats'])
+        columns = offset = None
+        with open(live_file, 'rb') as f:
+            header_line = f.readline()
+            header = next(csv.reader([header_line.decode('utf-8', errors='replace')]), None)
+            if header and 'Matric Number' in header:
+                columns = (
+                    header.index('Matric Number'),
+                    header.index('Percentage') if 'Percentage' in header else None,
+                    header.index('Time Taken (seconds)') if 'Time Taken (seconds)' in header else None
+                )
+                if header_line.endswith(b'\n'):
+                    offset = self.scan_results_rows(f, columns, matrics, stats)
+                    if offset is not None:
+                        f.seek(max(0, offset - RESULTS_INDEX_FINGERPRINT))
+                        index['fingerprint'] = f.read(offset - f.tell())
+        index['matrics'] = matrics
+        index['stats'] = stats
+        index['columns'] = columns
+        index['inode'] = stat.st_ino
+        index['offset'] = offset
+        index['signature'] = signature
+    
+    # Index only the rows appended since the last scan, if the log has just
+    # grown: same file, same archive, and the bytes before the offset unchanged
+    def extend_results_index(self, live_file, stat, archive_version):
+        index = self.results_index
+        if (index['offset'] is None or index['signature'] is None or index['signature'][1] != archive_version
+                or index['inode'] != stat.st_ino or stat.st_size <= index['offset']):
+            return False
+        with open(live_file, 'rb') as f:
+            f.seek(index['offset'] - len(index['fingerprint']))
+            if f.read(len(index['fingerprint'])) != index['fingerprint']:
+                return False
+            try:
+                offset = self.scan_results_rows(f, index['columns'], index['matrics'], index['stats'])
+            except Exception:
+                # Partly indexed: rescan from the start next time
+                index['signature'] = None
+                index['offset'] = None
+                raise
+            if offset is not None:
+                f.seek(max(0, offset - RESULTS_INDEX_FINGERPRINT))
+                index['fingerprint'] = f.read(offset - f.tell())
+        index['offset'] = offset
+        return True
+    
+    # Add the rows from f's position onwards to matrics and stats. Returns the
+    # offset after the last row, or None if the log ends mid-row.
+    def scan_results_rows(self, f, columns, matrics, stats):
+        if columns is None:
+            return None
+        column, percentage_column, time_column = columns
+        scanned = {'offset': f.tell(), 'complete': True}
+        
+        def lines():
+            for line in f:
+                scanned['offset'] += len(line)
+                scanned['complete'] = line.endswith(b'\n')
+                yield line.decode('utf-8', errors='replace')
+        
+        for row in csv.reader(lines()):
+            if not row:
+                continue
+            if len(row) > column:
+                matrics.add(row[column])
+            add_to_results_stats(
+                stats,
+                row[percentage_column] if percentage_column is not None and len(row) > percentage_column else None,
+                row[time_column] if time_column is not None and len(row) > time_column else None
+            )
+        return scanned['offset'] if scanned['complete'] else None
+    
+    def invalidate_results_index(self):
+        index = self.results_index
+        with index['lock']:
+            index['signature'] = None
+            index['matrics'] = set()
+            index['stats'] = empty_results_stats()
+            index['offset'] = None
+            index['archive_version'] = None
+            index['archive_matrics'] = None
+            index['archive_stats'] = None
+    
+    def has_taken_test(self, matric):
+        with self.results_index['lock']:
+            try:
+                self.refresh_results_index()
+            except (OSError, csv.Error):
+                return False
+            return str(matric) in self.results_index['matrics']
+    
+    def results_stats(self):
+        with self.results_index['lock']:
+            self.refresh_results_index()
+            return copy_results_stats(self.results_index['stats'])
+    
+    def load_results(self):
+        import pandas as pd
+        
+        frames = list(self.archive.iter_frames(self.archive.parts()))
+        live = self.load_live_results()
+        return pd.concat(frames + [live], ignore_index=True) if frames else live
+    
+    def load_live_results(self):
+        import pandas as pd
+        
+        return pd.read_csv(self.live_results_file(), dtype={'Matric Number': str, 'Answers': str})
+    
+    def iter_results_chunks(self, columns=None, chunksize=RESULTS_CHUNK_SIZE):
+        return self.iter_results_frames(columns, chunksize=chunksize)
+    
+    # Archive parts, then chunks of the live log, indexed by row position over
+    # both; archived days outside [date_from, date_to] are skipped unread
+    def iter_results_frames(self, columns=None, date_from=None, date_to=None, chunksize=RESULTS_CHUNK_SIZE):
+        import pandas as pd
+        
+        parts = self.archive.parts()
+        yield from self.archive.iter_frames(parts, columns, date_from, date_to)
+        offset = sum(part['rows'] for part in parts)
+        for chunk in pd.read_csv(self.live_results_file(), usecols=columns, chunksize=chunksize,
+                                 dtype={'Matric Number': str, 'Student Name': str, 'Answers': str}):
+            chunk.index = chunk.index + offset
+            yield chunk
+    
+    # Load only the rows at the given 0-based positions, in the order given;
+    # positions count archived rows first, then the live log
+    def fetch_result_rows(self, positions, columns=None):
+        import pandas as pd
+        
+        if not positions:
+            return pd.DataFrame(columns=columns or RESULTS_COLUMNS)
+        parts = self.archive.parts()
+        archived = sum(part['rows'] for part in parts)
+        frames = []
+        if any(p < archived for p in positions):
+            frames.append(self.archive.take(parts, [p for p in positions if p < archived], columns))
+        live_positions = [p - archived for p in positions if p >= archived]
+        if live_positions:
+            live = self.fetch_live_rows(live_positions, columns)
+            live.index = live.index + archived
+            frames.append(live)
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        return df.reindex([p for p in positions if p in df.index])
+    
+    def fetch_live_rows(self, positions, columns=None):
+        import pandas as pd
+        
+        wanted = set(positions)
+        df = pd.read_csv(
+            self.live_results_file(),
+            usecols=columns,
+            skiprows=lambda line: line > 0 and (line - 1) not in wanted,
+            nrows=len(wanted),
+            dtype={'Matric Number': str, 'Student Name': str, 'Answers': str}
+        )
+        df.index = sorted(wanted)[:len(df)]
+        return df.reindex([p for p in positions if p in df.index])
+    
+    # Sorting by Timestamp uses log order, so the unfiltered default view needs
+    # no scan at all; anything else is a chunked scan of the needed columns
+    def query_results(self, filters, sort_by, ascending, page, page_size):
+        import pandas as pd
+        
+        f = parse_results_filters(filters)
+        
+        if not has_results_filters(f) and sort_by == 'Timestamp':
+            total = self.results_stats()['count']
+            order = range(total) if ascending else range(total - 1, -1, -1)
+            positions = list(order[page * page_size:(page + 1) * page_size])
+            return self.fetch_result_rows(positions, RESULTS_TABLE_COLUMNS), total
+        
+        columns = {'Timestamp', 'Matric Number', 'Student Name', 'Percentage', sort_by}
+        matches = []
+        for chunk in self.iter_results_frames(
+            [c for c in RESULTS_COLUMNS if c in columns],
+            f['date_from'].isoformat() if f['date_from'] else None,
+            f['date_to'].isoformat() if f['date_to'] else None
+        ):
+            mask = pd.Series(True, index=chunk.index)
+            if f['matric']:
+                mask &= chunk['Matric Number'].fillna('').str.contains(f['matric'], case=False, regex=False)
+            if f['name']:
+                mask &= chunk['Student Name'].fillna('').str.lower().str.contains(f['name'], regex=False)
+            if f['date_from']:
+                mask &= chunk['Timestamp'].str[:10] >= f['date_from'].isoformat()
+            if f['date_to']:
+                mask &= chunk['Timestamp'].str[:10] <= f['date_to'].isoformat()
+            if f['score_min'] > 0 or f['score_max'] < 100:
+                percentages = pd.to_numeric(chunk['Percentage'], errors='coerce')
+                mask &= percentages.between(f['score_min'], f['score_max'])
+            matches.append(pd.DataFrame({'position': chunk.index[mask], 'key': chunk.loc[mask, sort_by]}))
+        
+        matches = pd.concat(matches, ignore_index=True) if matches else pd.DataFrame(columns=['position', 'key'])
+        if sort_by == 'Timestamp':
+            matches = matches.sort_values('position', ascending=ascending)
+        else:
+            matches = matches.sort_values(['key', 'position'], ascending=ascending, kind='mergesort')
+        positions = matches['position'].iloc[page * page_size:(page + 1) * page_size].tolist()
+        return self.fetch_result_rows(positions, RESULTS_TABLE_COLUMNS), len(matches)
+    
+    # Re-score every stored answer sheet with `grade(sheets)` and rewrite the
+    # log and any archived parts whose scores changed
+    def update_scores(self, grade):
+        import numpy as np
+        
+        with file_lock(self.results_lock_file):
+            self.finish_compaction()
+            regraded, changed = self.archive.update_scores(grade)
+            
+            df = self.load_live_results()
+            has_sheet = df['Answers'].notna() & (df['Answers'] != '')
+            if has_sheet.any():
+                sheets = [json.loads(sheet) for sheet in df.loc[has_sheet, 'Answers']]
+                scores, totals, percentages = grade(sheets)
+                
+                regraded += int(has_sheet.sum())
+                changed += int((df.loc[has_sheet, 'Score'].to_numpy() != scores).sum())
+                df.loc[has_sheet, 'Score'] = scores
+                df.loc[has_sheet, 'Total Questions'] = totals
+                df.loc[has_sheet, 'Percentage'] = np.round(percentages, 2)
+                self.write_results_frame(df)
+        
+        self.invalidate_results_index()
+        return regraded, changed
+    
+    # Archived results go too
+    def clear_results(self):
+        with file_lock(self.results_lock_file):
+            self.archive.clear()
+            if os.path.exists(self.compacted_file):
+                os.remove(self.compacted_file)
+        self.reset_results_file()
+        self.invalidate_results_index()
+
+# Column names of the results table in SQLite, in RESULTS_COLUMNS order
+RESULTS_SQL_COLUMNS = {
+    'Timestamp': 'timestamp',
+    'Student Name': 'student_name',
+    'Matric Number': 'matric_number',
+    'Score': 'score',
+    'Total Questions': 'total_questions',
+    'Percentage': 'percentage',
+    'Time Taken (seconds)': 'time_taken',
+    'Answers': 'answers'
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+INSERT OR IGNORE INTO versions (name, version) VALUES ('questions', 0), ('results', 0), ('config', 0);
+
+CREATE TABLE IF NOT EXISTS questions (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    student_name TEXT,
+    matric_number TEXT NOT NULL,
+    score INTEGER,
+    total_questions INTEGER,
+    percentage REAL,
+    time_taken INTEGER,
+    answers TEXT
+);
+CREATE INDEX IF NOT EXISTS results_matric_number ON results (matric_number);
+CREATE INDEX IF NOT EXISTS results_timestamp ON results (timestamp);
+
+CREATE TABLE IF NOT EXISTS progress (
+    matric_number TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress_answers (
+    matric_number TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    PRIMARY KEY (matric_number, question_id)
+);
+
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+
+-- Any change to questions or results, including edits made outside the app,
+-- bumps a version that in-process caches are keyed on
+CREATE TRIGGER IF NOT EXISTS questions_insert AFTER INSERT ON questions
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'questions'; END;
+CREATE TRIGGER IF NOT EXISTS questions_update AFTER UPDATE ON questions
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'questions'; END;
+CREATE TRIGGER IF NOT EXISTS questions_delete AFTER DELETE ON questions
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'questions'; END;
+CREATE TRIGGER IF NOT EXISTS config_insert AFTER INSERT ON settings WHEN NEW.key = 'config'
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'config'; END;
+CREATE TRIGGER IF NOT EXISTS config_update AFTER UPDATE ON settings WHEN NEW.key = 'config'
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'config'; END;
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'results'; END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE ON results
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'results'; END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+BEGIN UPDATE versions SET version = version + 1 WHERE name = 'results'; END;
+"""
+
+# Everything in one SQLite database in WAL mode: readers never block the
+# writer, and each write is a short IMMEDIATE transaction
+class SQLiteStorage(Storage):
+    def __init__(self, path):
+        self.path = path
+        self.pool_lock = threading.Lock()
+        self.pool = []
+        self.stats_lock = threading.Lock()
+        self.stats_cache = {'version': None, 'stats': empty_results_stats()}
+        # Live monitor summaries, re-read only for rows whose updated_at moved
+        self.progress_lock = threading.Lock()
+        self.progress_cache = {}
+    
+    # Borrow a connection from the pool, opening one if none is idle.
+    # Streamlit runs every rerun on a fresh thread, so connections are shared
+    # between threads but only ever used by one at a time.
+    @contextmanager
+    def connection(self):
+        with self.pool_lock:
+            conn = self.pool.pop() if self.pool else None
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+        try:
+            yield conn
+        finally:
+            with self.pool_lock:
+                if len(self.pool) < SQLITE_POOL_SIZE:
+                    self.pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+    
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    def version(self, conn, name):
+        return conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+    
+    def initialize(self):
+        with self.connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO settings (key, value) VALUES ('admin_credentials', ?)",
+                (json.dumps(DEFAULT_ADMIN),)
+            )
+    
+    # Questions
+    def questions_version(self):
+        with self.connection() as conn:
+            return self.version(conn, 'questions')
+    
+    def load_questions(self):
+        with self.connection() as conn:
+            rows = conn.execute("SELECT data FROM questions ORDER BY position").fetchall()
+        return [json.loads(data) for (data,) in rows]
+    
+    def save_questions(self, questions):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM questions")
+            conn.executemany(
+                "INSERT INTO questions (position, id, data) VALUES (?, ?, ?)",
+                [(i, str(q['id']), json.dumps(q)) for i, q in enumerate(questions)]
+            )
+    
+    # Rewrite only the rows whose id is imported, appending new ids after the rest
+    def merge_questions(self, questions):
+        with self.transaction() as conn:
+            positions = dict(conn.execute("SELECT id, position FROM questions"))
+            next_position = max(positions.values(), default=-1) + 1
+            updates, inserts = [], []
+            for q in questions:
+                position = positions.get(str(q['id']))
+                if position is None:
+                    inserts.append((next_position, str(q['id']), json.dumps(q)))
+                    next_position += 1
+                else:
+                    updates.append((json.dumps(q), position))
+            conn.executemany("UPDATE questions SET data = ? WHERE position = ?", updates)
+            conn.executemany("INSERT INTO questions (position, id, data) VALUES (?, ?, ?)", inserts)
+        return len(inserts), len(updates)
+    
+    # Configuration
+    def config_version(self):
+        with self.connection() as conn:
+            return self.version(conn, 'config')
+    
+    def load_config(self):
+        with self.connection() as conn:
+            row = conn.execute("SELECT value FROM settings WHERE key = 'config'").fetchone()
+        return json.loads(row[0]) if row else {}
+    
+    def save_config(self, config):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('config', ?)", (json.dumps(config),))
+    
+    # Admin credentials
+    def load_admin_credentials(self):
+        with self.connection() as conn:
+            row = conn.execute("SELECT value FROM settings WHERE key = 'admin_credentials'").fetchone()
+        return json.loads(row[0]) if row else dict(DEFAULT_ADMIN)
+    
+    def save_admin_credentials(self, credentials):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('admin_credentials', ?)",
+                (json.dumps(credentials),)
+            )
+    
+    # In-progress tests: a snapshot row plus one row per changed answer
+    def save_progress(self, matric, data):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO progress (matric_number, data, updated_at) VALUES (?, ?, ?)",
+                (matric, json.dumps(data), time.time())
+            )
+            conn.execute("DELETE FROM progress_answers WHERE matric_number = ?", (matric,))
+    
+    def record_answer(self, matric, q_id, answer):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO progress_answers (matric_number, question_id, answer) VALUES (?, ?, ?)",
+                (matric, q_id, answer)
+            )
+            conn.execute("UPDATE progress SET updated_at = ? WHERE matric_number = ?", (time.time(), matric))
+    
+    def load_progress(self, matric):
+        with self.connection() as conn:
+            row = conn.execute("SELECT data FROM progress WHERE matric_number = ?", (matric,)).fetchone()
+            if row is None:
+                return None
+            answers = conn.execute(
+                "SELECT question_id, answer FROM progress_answers WHERE matric_number = ?", (matric,)
+            ).fetchall()
+        data = json.loads(row[0])
+        for q_id, answer in answers:
+            data["answers"][q_id] = answer
+        return data
+    
+    def clear_progress(self, matric):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM progress_answers WHERE matric_number = ?", (matric,))
+            conn.execute("DELETE FROM progress WHERE matric_number = ?", (matric,))
+    
+    def list_progress(self):
+        with self.connection() as conn:
+            return [matric for (matric,) in conn.execute("SELECT matric_number FROM progress")]
+    
+    def progress_summaries(self):
+        with self.connection() as conn:
+            rows = conn.execute("SELECT matric_number, updated_at FROM progress").fetchall()
+        with self.progress_lock:
+            summaries = {}
+            for matric, updated_at in rows:
+                summary = self.progress_cache.get(matric)
+                if summary is None or summary['updated_at'] != updated_at:
+                    data = self.load_progress(matric)
+                    if data is None:
+                        continue
+                    summary = summarize_progress(matric, data, updated_at)
+                summaries[matric] = summary
+            self.progress_cache = summaries
+            return list(summaries.values())
+    
+    # Results
+    def results_version(self):
+        with self.connection() as conn:
+            return f"sqlite_{self.version(conn, 'results')}"
+    
+    def append_result(self, row, unique=False):
+        with self.transaction() as conn:
+            if unique and conn.execute(
+                "SELECT 1 FROM results WHERE matric_number = ? LIMIT 1", (str(row[2]),)
+            ).fetchone():
+                return False
+            before = self.version(conn, 'results')
+            conn.execute(
+                f"INSERT INTO results ({', '.join(RESULTS_SQL_COLUMNS.values())}) "
+                f"VALUES ({', '.join('?' * len(RESULTS_SQL_COLUMNS))})",
+                row
+            )
+            after = self.version(conn, 'results')
+        
+        with self.stats_lock:
+            if self.stats_cache['version'] == before:
+                add_to_results_stats(self.stats_cache['stats'], row[5], row[6])
+                self.stats_cache['version'] = after
+        return True
+    
+    def has_taken_test(self, matric):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM results WHERE matric_number = ? LIMIT 1", (str(matric),)
+            ).fetchone()
+        return row is not None
+    
+    def results_stats(self):
+        with self.connection() as conn, self.stats_lock:
+            version = self.version(conn, 'results')
+            if self.stats_cache['version'] != version:
+                stats = empty_results_stats()
+                (stats['count'], stats['percentage_sum'], stats['percentage_count'],
+                 stats['time_sum'], stats['time_count']) = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(percentage), 0), COUNT(percentage), "
+                    "COALESCE(SUM(time_taken), 0), COUNT(time_taken) "
+                    "FROM results"
+                ).fetchone()
+                for bin_index, count in conn.execute(
+                    "SELECT MIN(MAX(CAST(percentage AS INTEGER), 0), 100), COUNT(*) "
+                    "FROM results WHERE percentage IS NOT NULL GROUP BY 1"
+                ):
+                    stats['histogram'][bin_index] = count
+                self.stats_cache = {'version': version, 'stats': stats}
+            return copy_results_stats(self.stats_cache['stats'])
+    
+    def invalidate_results_index(self):
+        with self.stats_lock:
+            self.stats_cache = {'version': None, 'stats': empty_results_stats()}
+    
+    def select_results(self, columns=None):
+        columns = columns or RESULTS_COLUMNS
+        return ', '.join(f'{RESULTS_SQL_COLUMNS[c]} AS "{c}"' for c in columns)
+    
+    def load_results(self):
+        import pandas as pd
+        
+        with self.connection() as conn:
+            return pd.read_sql_query(f"SELECT {self.select_results()} FROM results ORDER BY id", conn)
+    
+    # The connection stays borrowed until the last chunk has been read
+    def iter_results_chunks(self, columns=None, chunksize=RESULTS_CHUNK_SIZE):
+        import pandas as pd
+        
+        with self.connection() as conn:
+            yield from pd.read_sql_query(
+                f"SELECT {self.select_results(columns)} FROM results ORDER BY id",
+                conn,
+                chunksize=chunksize
+            )
+    
+    def query_results(self, filters, sort_by, ascending, page, page_size):
+        import pandas as pd
+        
+        f = parse_results_filters(filters)
+        clauses, params = [], []
+        if f['matric']:
+            clauses.append("matric_number LIKE ?")
+            params.append(f"%{f['matric']}%")
+        if f['name']:
+            clauses.append("LOWER(student_name) LIKE ?")
+            params.append(f"%{f['name']}%")
+        if f['date_from']:
+            clauses.append("timestamp >= ?")
+            params.append(f['date_from'].isoformat())
+        if f['date_to']:
+            # Before the start of the following day, so the timestamp index applies
+            clauses.append("timestamp < ?")
+            params.append((f['date_to'] + timedelta(days=1)).isoformat())
+        if f['score_min'] > 0 or f['score_max'] < 100:
+            clauses.append("percentage BETWEEN ? AND ?")
+            params.extend([f['score_min'], f['score_max']])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        direction = "ASC" if ascending else "DESC"
+        order = f"id {direction}" if sort_by == 'Timestamp' else f"{RESULTS_SQL_COLUMNS[sort_by]} {direction}, id {direction}"
+        
+        with self.connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM results {where}", params).fetchone()[0]
+            page_df = pd.read_sql_query(
+                f"SELECT {self.select_results(RESULTS_TABLE_COLUMNS)} FROM results {where} "
+                f"ORDER BY {order} LIMIT ? OFFSET ?",
+                conn,
+                params=params + [page_size, page * page_size]
+            )
+        return page_df, total
+    
+    def update_scores(self, grade):
+        import numpy as np
+        
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, answers, score FROM results WHERE answers IS NOT NULL AND answers != ''"
+            ).fetchall()
+            if not rows:
+                return 0, 0
+            
+            sheets = [json.loads(answers) for _, answers, _ in rows]
+            scores, totals, percentages = grade(sheets)
+            
+            old_scores = np.array([score for _, _, score in rows])
+            changed = int((old_scores != scores).sum())
+            conn.executemany(
+                "UPDATE results SET score = ?, total_questions = ?, percentage = ? WHERE id = ?",
+                [(int(s), int(t), round(float(p), 2), row[0])
+                 for s, t, p, row in zip(scores, totals, percentages, rows)]
+            )
+        
+        self.invalidate_results_index()
+        return len(rows), changed
+    
+    def clear_results(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM results")
+        self.invalidate_results_index()
+    
+    # Results already sit in a typed, indexed table, so nothing is archived
+    def compact_results(self, before):
+        return 0
+
+# Storage shards by test id, shared by every session in the process
+STORAGE_REGISTRY = PROCESS_STATE['storage']
+
+def open_storage(test_id, backend):
+    root = '' if test_id == DEFAULT_TEST_ID else os.path.join(TESTS_DIR, test_id)
+    if root:
+        move_legacy_shard(test_id, root)
+        os.makedirs(root, exist_ok=True)
+    if backend == 'sqlite':
+        storage = SQLiteStorage(os.path.join(root, SQLITE_FILE))
+    else:
+        storage = FileStorage(
+            os.path.join(root, QUESTIONS_FILE),
+            os.path.join(root, RESULTS_FILE),
+            os.path.join(root, PROGRESS_DIR),
+            ADMIN_CREDENTIALS_FILE,
+            CONFIG_FILE,
+            os.path.join(root, RESULTS_ARCHIVE_DIR)
+        )
+    storage.initialize()
+    return storage
+
+# Move a test's shard out of LEGACY_TESTS_DIR, unless it already has one here
+def move_legacy_shard(test_id, root):
+    legacy = os.path.join(LEGACY_TESTS_DIR, test_id)
+    if not os.path.isdir(legacy) or os.path.exists(root):
+        return
+    os.makedirs(TESTS_DIR, exist_ok=True)
+    try:
+        os.rename(legacy, root)
+    except FileNotFoundError:
+        pass  # another process moved it first
+    else:
+        logger.warning("Moved test %s from %s to %s", test_id, legacy, root)
+
+# One storage shard per test, opened on first use
+def get_storage(test_id=DEFAULT_TEST_ID):
+    storage = STORAGE_REGISTRY['shards'].get(test_id)
+    if storage is None:
+        with STORAGE_REGISTRY['lock']:
+            storage = STORAGE_REGISTRY['shards'].get(test_id)
+            if storage is None:
+                storage = open_storage(test_id, STORAGE_BACKEND)
+                STORAGE_REGISTRY['shards'][test_id] = storage
+    return storage
+
+# Process-wide parsed question bank per test, shared by every session
+QUESTION_BANK_CACHES = PROCESS_STATE['question_banks']
+
+def get_question_bank_cache(test_id):
+    cache = QUESTION_BANK_CACHES['caches'].get(test_id)
+    if cache is None:
+        with QUESTION_BANK_CACHES['lock']:
+            cache = QUESTION_BANK_CACHES['caches'].setdefault(
+                test_id, {'lock': threading.Lock(), 'version': None, 'bank': None}
+            )
+    return cache
+
+# Everything show_test and submit_test need, computed once per bank version
+def build_question_bank(questions, version):
+    return {
+        'version': version,
+        'questions': questions,
+        'id_index': {str(q['id']): idx for idx, q in enumerate(questions)},
+        'ids': [str(q['id']) for q in questions],
+        'answer_key': [q['correct_answer'] for q in questions],
+        'answer_codes': encode_labels([q['correct_answer'] for q in questions], missing=-1),
+        'options_display': [
+            [f"{OPTION_LABELS[i]}. {opt}" for i, opt in enumerate(q['options'])]
+            for q in questions
+        ],
+        'option_orders': None,
+        'tag_groups': build_tag_groups(questions)
+    }
+
+# Bank positions of the questions carrying each tag ('' for untagged)
+def build_tag_groups(questions):
+    import numpy as np
+    
+    groups = {}
+    for idx, q in enumerate(questions):
+        groups.setdefault(str(q.get(PAPER_TAG_FIELD) or ''), []).append(idx)
+    return {tag: np.array(positions) for tag, positions in groups.items()}
+
+def get_question_bank(test_id):
+    storage = get_storage(test_id)
+    cache = get_question_bank_cache(test_id)
+    version = storage.questions_version()
+    
+    with cache['lock']:
+        if cache['bank'] is None or cache['version'] != version:
+            try:
+                bank = build_question_bank(storage.load_questions(), version)
+            except:
+                bank = build_question_bank([], version)
+            cache['bank'] = bank
+            cache['version'] = version
+        return cache['bank']
+
+def paper_rng(test_id, matric):
+    import numpy as np
+    
+    digest = hashlib.sha256(f"{PAPER_SEED}:{test_id}:{matric}".encode('utf-8')).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], 'big'))
+
+# Split `count` draws across tag groups in proportion to their size
+def allocate_draws(group_sizes, count):
+    import numpy as np
+    
+    sizes = np.array(group_sizes)
+    shares = sizes * count / sizes.sum()
+    quotas = np.floor(shares).astype(int)
+    leftover = count - quotas.sum()
+    if leftover:
+        quotas[np.argsort(quotas - shares, kind='stable')[:leftover]] += 1
+    return quotas
+
+# Bank positions on one student's paper, in the order they are asked
+def draw_paper_positions(bank, rng, count, stratify_by_tag):
+    import numpy as np
+    
+    pool = len(bank['ids'])
+    count = min(count, pool)
+    if count == pool:
+        return rng.permutation(pool)
+    if not stratify_by_tag:
+        return rng.choice(pool, size=count, replace=False)
+    
+    groups = list(bank['tag_groups'].values())
+    quotas = allocate_draws([len(group) for group in groups], count)
+    positions = np.concatenate([
+        rng.choice(group, size=quota, replace=False)
+        for group, quota in zip(groups, quotas) if quota
+    ])
+    rng.shuffle(positions)
+    return positions
+
+# The questions one student sees, shaped like the bank: ids, questions and
+# options_display for the paper only. option_orders[i][j] is the bank option
+# shown in place j, so answers are always kept under the bank's labels. With
+# the default settings every student gets the bank itself.
+def build_paper(bank, test, matric):
+    import numpy as np
+    
+    if not test['questions_per_test'] and not test['shuffle_options']:
+        return bank
+    
+    rng = paper_rng(test['id'], matric)
+    if test['questions_per_test']:
+        positions = draw_paper_positions(bank, rng, test['questions_per_test'], test['stratify_by_tag'])
+    else:
+        positions = np.arange(len(bank['ids']))
+    
+    questions = [bank['questions'][idx] for idx in positions]
+    if test['shuffle_options']:
+        option_orders = [rng.permutation(len(q['options'])).tolist() for q in questions]
+    else:
+        option_orders = [list(range(len(q['options']))) for q in questions]
+    return {
+        'version': bank['version'],
+        'questions': questions,
+        'ids': [bank['ids'][idx] for idx in positions],
+        'options_display': [
+            [f"{OPTION_LABELS[i]}. {q['options'][j]}" for i, j in enumerate(order)]
+            for q, order in zip(questions, option_orders)
+        ],
+        'option_orders': option_orders
+    }
+
+# The logged-in student's paper, rebuilt only when the bank or paper settings change
+def get_session_paper(bank):
+    test = get_test_settings(st.session_state.test_id)
+    matric = st.session_state.matric_number
+    key = (bank['version'], test['id'], matric,
+           test['questions_per_test'], test['stratify_by_tag'], test['shuffle_options'])
+    cached = st.session_state.get('paper')
+    if cached is None or cached['key'] != key:
+        cached = {'key': key, 'paper': build_paper(bank, test, matric)}
+        st.session_state.paper = cached
+    return cached['paper']
+
+# Load questions (cached; treat the returned list as read-only)
+@instrumented('load_questions')
+def load_questions(test_id):
+    return get_question_bank(test_id)['questions']
+
+# Save questions
+def save_questions(test_id, questions):
+    get_storage(test_id).save_questions(questions)
+    invalidate_question_bank(test_id)
+
+def invalidate_question_bank(test_id):
+    cache = get_question_bank_cache(test_id)
+    with cache['lock']:
+        cache['bank'] = None
+        cache['version'] = None
+
+# `existing` with same-id questions replaced in place and new ones appended
+def merge_question_lists(existing, questions):
+    merged = list(existing)
+    positions = {str(q['id']): idx for idx, q in enumerate(merged)}
+    added = updated = 0
+    for q in questions:
+        idx = positions.get(str(q['id']))
+        if idx is None:
+            positions[str(q['id'])] = len(merged)
+            merged.append(q)
+            added += 1
+        else:
+            merged[idx] = q
+            updated += 1
+    return merged, added, updated
+
+def merge_questions(test_id, questions):
+    added, updated = get_storage(test_id).merge_questions(questions)
+    invalidate_question_bank(test_id)
+    return added, updated
+
+# Records from an uploaded question file, read one at a time as
+# (row number, record); JSON Lines records are still unparsed text
+def iter_question_records(uploaded_file, file_format):
+    if file_format == 'xlsx':
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip().lower() if cell is not None else '' for cell in next(rows, ())]
+            for row_number, row in enumerate(rows, start=2):
+                if any(cell is not None and str(cell).strip() for cell in row):
+                    yield row_number, dict(zip(header, row))
+        finally:
+            workbook.close()
+        return
+    
+    uploaded_file.seek(0)
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(text)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            for record in reader:
+                if any(value and value.strip() for value in record.values() if isinstance(value, str)):
+                    yield reader.line_num, record
+        elif file_format == 'json':
+            records = json.load(text)
+            if not isinstance(records, list):
+                raise ValueError("Questions must be an array")
+            for row_number, record in enumerate(records, start=1):
+                yield row_number, record
+        else:
+            for row_number, line in enumerate(text, start=1):
+                if line.strip():
+                    yield row_number, line
+    finally:
+        # Leave the upload open for the next rerun
+        text.detach()
+
+def normalize_question_id(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.isdigit():
+            return int(value)
+    return value
+
+# Validate one imported record into a question, raising ValueError with the reason
+def parse_question_record(record):
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("Expected an object with id, question, options and correct_answer")
+    
+    question_id = normalize_question_id(record.get('id'))
+    if question_id is None or question_id == '':
+        raise ValueError("Missing id")
+    
+    text = record.get('question')
+    if text is None or not str(text).strip():
+        raise ValueError("Missing question text")
+    
+    if 'options' in record:
+        options = record['options']
+        if not isinstance(options, list):
+            raise ValueError("options must be a list")
+    else:
+        options = [record.get(column) for column in QUESTION_OPTION_COLUMNS]
+        while options and (options[-1] is None or not str(options[-1]).strip()):
+            options.pop()
+    options = [str(option).strip() if option is not None else '' for option in options]
+    if not 2 <= len(options) <= len(OPTION_LABELS):
+        raise ValueError(f"Expected 2 to {len(OPTION_LABELS)} options, got {len(options)}")
+    if not all(options):
+        raise ValueError("Options must not be blank")
+    
+    correct_answer = str(record.get('correct_answer') or '').strip().upper()
+    if correct_answer not in OPTION_LABELS[:len(options)]:
+        raise ValueError(f"correct_answer must be one of {', '.join(OPTION_LABELS[:len(options)])}")
+    
+    # Keep any other fields (tags and the like) that carry a value
+    extra = {
+        key: value for key, value in record.items()
+        if key and key not in ('id', 'question', 'options', 'correct_answer')
+        and key not in QUESTION_OPTION_COLUMNS and value is not None and value != ''
+    }
+    return {'id': question_id, 'question': str(text).strip(), 'options': options,
+            'correct_answer': correct_answer, **extra}
+
+# Parse and validate a question file as a stream. Later rows win over earlier
+# rows with the same id; only the first IMPORT_ERRORS_SHOWN errors are kept.
+def read_question_file(uploaded_file, file_format):
+    questions = {}
+    errors = []
+    error_count = 0
+    row_count = 0
+    for row_number, record in iter_question_records(uploaded_file, file_format):
+        row_count += 1
+        try:
+            q = parse_question_record(record)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < IMPORT_ERRORS_SHOWN:
+                errors.append({'Row': row_number, 'Error': str(e)})
+            continue
+        questions[str(q['id'])] = q
+    return {
+        'questions': list(questions.values()),
+        'rows': row_count,
+        'errors': errors,
+        'error_count': error_count
+    }
+
+# Load admin credentials
+def load_admin_credentials():
+    return get_storage(DEFAULT_TEST_ID).load_admin_credentials()
+
+def save_admin_credentials(credentials):
+    get_storage(DEFAULT_TEST_ID).save_admin_credentials(credentials)
+
+# Shared configuration. Each process keeps it in memory and reloads it only
+# when the store's version (file signature or SQLite counter) changes, so every
+# worker process behind a load balancer sees an admin's change on its next rerun.
+CONFIG_CACHE = PROCESS_STATE['config']
+
+# A test with every setting at its default
+def new_test(test_id, title):
+    return {
+        'id': test_id,
+        'title': title,
+        'duration': DEFAULT_TEST_DURATION,
+        'opens_at': None,
+        'closes_at': None,
+        'pass_mark': PASS_MARK,
+        'questions_per_test': QUESTIONS_PER_TEST,
+        'stratify_by_tag': STRATIFY_BY_TAG,
+        'shuffle_options': SHUFFLE_OPTIONS
+    }
+
+# Fill in settings missing from stored tests; a fresh install has just the default test
+def build_config(stored):
+    tests = [dict(new_test(test['id'], test.get('title', test['id'])), **test) for test in stored.get('tests', [])]
+    return dict(stored, tests=tests or [new_test(DEFAULT_TEST_ID, 'Test')])
+
+# The cached configuration; treat it as read-only and save changes with save_config
+def get_config():
+    storage = get_storage(DEFAULT_TEST_ID)
+    cache = CONFIG_CACHE
+    version = storage.config_version()
+    
+    with cache['lock']:
+        if cache['config'] is None or cache['version'] != version:
+            cache['config'] = build_config(storage.load_config())
+            cache['version'] = version
+        return cache['config']
+
+def save_config(config):
+    get_storage(DEFAULT_TEST_ID).save_config(config)
+    
+    cache = CONFIG_CACHE
+    with cache['lock']:
+        cache['config'] = None
+        cache['version'] = None
+
+# Tests
+def load_tests():
+    return get_config()['tests']
+
+def get_test(test_id):
+    for test in load_tests():
+        if test['id'] == test_id:
+            return test
+    return None
+
+# Settings for grading and papers, even for a test that has since been removed
+def get_test_settings(test_id):
+    return get_test(test_id) or new_test(test_id, test_id)
+
+# Add a test or replace the one with the same id, keeping its place in the list
+def save_test(test):
+    tests = list(load_tests())
+    ids = [t['id'] for t in tests]
+    if test['id'] in ids:
+        tests[ids.index(test['id'])] = test
+    else:
+        tests.append(test)
+    save_config(dict(get_config(), tests=tests))
+
+def remove_test(test_id):
+    save_config(dict(get_config(), tests=[t for t in load_tests() if t['id'] != test_id]))
+
+def parse_test_time(value):
+    return datetime.strptime(value, TEST_TIME_FORMAT) if value else None
+
+def is_test_open(test, now=None):
+    now = now or datetime.now()
+    opens_at = parse_test_time(test.get('opens_at'))
+    closes_at = parse_test_time(test.get('closes_at'))
+    return (opens_at is None or opens_at <= now) and (closes_at is None or now < closes_at)
+
+def open_tests():
+    now = datetime.now()
+    return [test for test in load_tests() if is_test_open(test, now)]
+
+# Seconds a student starting `test` now gets: its duration, cut short by the window closing
+def test_time_allowed(test, start_time):
+    duration = test.get('duration', DEFAULT_TEST_DURATION)
+    closes_at = parse_test_time(test.get('closes_at'))
+    if closes_at is not None:
+        duration = min(duration, max(0, int(closes_at.timestamp() - start_time)))
+    return duration
+
+# Write a full progress snapshot from the session
+@instrumented('save_progress', write=True)
+def save_progress(test_id, matric):
+    data = {
+        "student_name": st.session_state.student_name,
+        "start_time": st.session_state.start_time,
+        "answers": st.session_state.answers,
+        "test_started": st.session_state.test_started,
+        "test_duration": st.session_state.test_duration
+    }
+    get_storage(test_id).save_progress(matric, data)
+    st.session_state.journal_entries = 0
+
+# Persist a single answer change; compact into the snapshot every so often
+@instrumented('record_answer', write=True)
+def record_answer(test_id, matric, q_id, answer):
+    get_storage(test_id).record_answer(matric, q_id, answer)
+    
+    st.session_state.journal_entries += 1
+    if st.session_state.journal_entries >= PROGRESS_COMPACT_EVERY:
+        save_progress(test_id, matric)
+
+def load_progress(test_id, matric):
+    return get_storage(test_id).load_progress(matric)
+
+def clear_progress(test_id, matric):
+    get_storage(test_id).clear_progress(matric)
+
+def get_progress_summaries(test_id):
+    return get_storage(test_id).progress_summaries()
+
+# Load all results as a DataFrame
+def load_results(test_id):
+    return get_storage(test_id).load_results()
+
+# Save a result; `answers` is the raw answer sheet kept for regrading.
+# With `unique`, a matric number that already has a result is left alone.
+@instrumented('save_result', write=True)
+def save_result(test_id, name, matric, score, total, percentage, time_taken, answers=None, unique=False):
+    result = [
+        datetime.now().strftime(RESULTS_TIME_FORMAT),
+        name,
+        matric,
+        score,
+        total,
+        round(percentage, 2),
+        time_taken,
+        json.dumps(answers, separators=(',', ':')) if answers is not None else ''
+    ]
+    return get_storage(test_id).append_result(result, unique=unique)
 
-PROGRESS_DIR = "progress"
-os.makedirs(PROGRESS_DIR, exist_ok=True)
+@instrumented('has_taken_test')
+def has_taken_test(test_id, matric):
+    return get_storage(test_id).has_taken_test(matric)
 
-def get_progress_file(matric):
-    return os.path.join(PROGRESS_DIR, f"progress_{matric}.json")
+def invalidate_results_index(test_id):
+    get_storage(test_id).invalidate_results_index()
 
-def save_progress(matric):
-    data = {
-        "start_time": st.session_state.start_time,
-        "answers": st.session_state.answers,
-        "test_started": st.session_state.test_started,
-        "test_duration": st.session_state.test_duration
+def clear_results(test_id):
+    get_storage(test_id).clear_results()
+
+# Archive the results submitted before `before` (a date); returns how many moved
+def compact_results(test_id, before):
+    return get_storage(test_id).compact_results(before)
+
+def get_archive_partitions(test_id):
+    return get_storage(test_id).archive_partitions()
+
+# The archive is written by the file backend, with pyarrow
+def results_archive_available():
+    return STORAGE_BACKEND == 'file' and importlib.util.find_spec('pyarrow') is not None
+
+# Snapshot of the running aggregates, rebuilt only if the results changed
+def get_results_stats(test_id):
+    return get_storage(test_id).results_stats()
+
+# Compare the running aggregates against a full recomputation from storage
+def check_results_stats(test_id):
+    import numpy as np
+    import pandas as pd
+    
+    stats = get_results_stats(test_id)
+    df = load_results(test_id)
+    percentages = pd.to_numeric(df['Percentage'], errors='coerce')
+    times = pd.to_numeric(df['Time Taken (seconds)'], errors='coerce')
+    
+    expected = {
+        'count': len(df),
+        'percentage_sum': float(percentages.sum()),
+        'time_sum': float(times.sum())
     }
-    with open(get_progress_file(matric), "w") as f:
-        json.dump(data, f)
+    mismatches = {}
+    for key, value in expected.items():
+        if abs(stats[key] - value) > 1e-6 * max(1.0, abs(value)):
+            mismatches[key] = (stats[key], value)
+    
+    histogram = np.bincount(np.clip(percentages.dropna().to_numpy(), 0, 100).astype(int), minlength=101).tolist()
+    if stats['histogram'] != histogram:
+        mismatches['histogram'] = (score_bands(stats), score_bands({'histogram': histogram}))
+    return mismatches
 
-def load_progress(matric):
-    file = get_progress_file(matric)
-    if os.path.exists(file):
-        with open(file, "r") as f:
-            return json.load(f)
-    return None
+# Filter, sort and page the results in the storage backend
+def query_results(test_id, filters, sort_by='Timestamp', ascending=False, page=0, page_size=50):
+    return get_storage(test_id).query_results(filters, sort_by, ascending, page, page_size)
+
+# Stream the results into an export file, built once per results version.
+# Older exports are removed so the directory holds one file per test and format.
+def build_results_export(test_id, file_format):
+    storage = get_storage(test_id)
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    prefix = f"test_results_{test_id}_"
+    path = os.path.join(EXPORT_DIR, f"{prefix}{storage.results_version()}.{file_format}")
+    if os.path.exists(path):
+        return path
+    
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if file_format == 'csv':
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            f.write(format_csv_row(RESULTS_TABLE_COLUMNS))
+            for chunk in storage.iter_results_chunks(RESULTS_TABLE_COLUMNS):
+                chunk.to_csv(f, index=False, header=False, lineterminator='\n')
+    else:
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Results")
+        sheet.append(RESULTS_TABLE_COLUMNS)
+        for chunk in storage.iter_results_chunks(RESULTS_TABLE_COLUMNS):
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False):
+                sheet.append(list(row))
+        workbook.save(tmp_file)
+    os.replace(tmp_file, path)
+    
+    for name in os.listdir(EXPORT_DIR):
+        if name.startswith(prefix) and name.endswith(f".{file_format}") and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(EXPORT_DIR, name))
+            except OSError:
+                pass
+    return path
+
+# The download button needs the whole file in memory anyway, so only building
+# the export is memory-bounded, not serving it
+def read_results_export(test_id, file_format):
+    with open(build_results_export(test_id, file_format), 'rb') as f:
+        return f.read()
 
-def clear_progress(matric):
-    file = get_progress_file(matric)
-    if os.path.exists(file):
-        os.remove(file)
+# Answer labels as small integers: 0 = unanswered, 1 = A, 2 = B, ...
+def encode_labels(labels, missing=0):
+    import numpy as np
+    
+    codes = {label: i + 1 for i, label in enumerate(OPTION_LABELS)}
+    return np.array([codes.get(label, missing) for label in labels], dtype=np.int8)
 
-# Initialize files
-def initialize_files():
-    # Questions file
-    if not os.path.exists(QUESTIONS_FILE):
-        with open(QUESTIONS_FILE, 'w') as f:
-            json.dump([], f)
+# Submissions x questions matrix of answer codes, plus a mask of the questions
+# that were on each student's paper. Sheets of the same paper list the same
+# questions in the same order, so each such group is encoded as one array.
+def build_answer_matrix(answer_sheets, bank):
+    import numpy as np
     
-    # Results file
-    if not os.path.exists(RESULTS_FILE):
-        df = pd.DataFrame(columns=['Timestamp', 'Student Name', 'Matric Number', 
-                                   'Score', 'Total Questions', 'Percentage', 'Time Taken (seconds)'])
-        df.to_csv(RESULTS_FILE, index=False)
+    id_index = bank['id_index']
+    matrix = np.zeros((len(answer_sheets), len(bank['ids'])), dtype=np.int8)
+    on_paper = np.zeros(matrix.shape, dtype=bool)
     
-    # Admin credentials
-    if not os.path.exists(ADMIN_CREDENTIALS_FILE):
-        default_admin = {
-            'username': 'admin',
-            'password': 'admin123'
-        }
-        with open(ADMIN_CREDENTIALS_FILE, 'w') as f:
-            json.dump(default_admin, f)
+    groups = {}
+    for row, sheet in enumerate(answer_sheets):
+        groups.setdefault(tuple(sheet), []).append(row)
+    for q_ids, rows in groups.items():
+        cols = np.array([id_index.get(q_id, -1) for q_id in q_ids], dtype=np.intp)
+        known = cols >= 0
+        if not known.any():
+            continue
+        labels = np.array([list(answer_sheets[row].values()) for row in rows])[:, known]
+        codes = np.zeros(labels.shape, dtype=np.int8)
+        for i, label in enumerate(OPTION_LABELS):
+            codes[labels == label] = i + 1
+        rows = np.array(rows)[:, None]
+        matrix[rows, cols[known]] = codes
+        on_paper[rows, cols[known]] = True
+    return matrix, on_paper
 
-initialize_files()
+# Score every submission at once against the bank's answer key
+def grade_matrix(matrix, on_paper, bank):
+    import numpy as np
+    
+    correct = (matrix == bank['answer_codes']) & on_paper
+    scores = correct.sum(axis=1)
+    totals = on_paper.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(totals > 0, scores / totals * 100, 0.0)
+    return scores, totals, percentages
 
-# Load questions
-def load_questions():
-    try:
-        with open(QUESTIONS_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return []
+# Answer sheet for one student: every question on the paper, '' if unanswered
+def build_answer_sheet(paper, answers):
+    return {q_id: answers.get(q_id, '') for q_id in paper['ids']}
 
-# Save questions
-def save_questions(questions):
-    with open(QUESTIONS_FILE, 'w') as f:
-        json.dump(questions, f, indent=2)
+def grade_answers(bank, paper, answers):
+    matrix, on_paper = build_answer_matrix([build_answer_sheet(paper, answers)], bank)
+    scores, totals, percentages = grade_matrix(matrix, on_paper, bank)
+    return int(scores[0]), int(totals[0]), float(percentages[0])
 
-# Load admin credentials
-def load_admin_credentials():
-    try:
-        with open(ADMIN_CREDENTIALS_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return {'username': 'admin', 'password': 'admin123'}
-
-# Save result to CSV
-def save_result(name, matric, score, total, percentage, time_taken):
-    result = {
-        'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'Student Name': name,
-        'Matric Number': matric,
-        'Score': score,
-        'Total Questions': total,
-        'Percentage': round(percentage, 2),
-        'Time Taken (seconds)': time_taken
+# Re-score every stored answer sheet against the current answer key
+def regrade_results(test_id):
+    bank = get_question_bank(test_id)
+    
+    def grade(sheets):
+        matrix, on_paper = build_answer_matrix(sheets, bank)
+        return grade_matrix(matrix, on_paper, bank)
+    
+    return get_storage(test_id).update_scores(grade)
+
+# Every stored answer sheet of a test; rows from before answers were stored are skipped
+def load_answer_sheets(test_id):
+    sheets = []
+    for chunk in get_storage(test_id).iter_results_chunks(['Answers']):
+        raw = [value for value in chunk['Answers'] if isinstance(value, str) and value]
+        try:
+            parsed = json.loads('[' + ','.join(raw) + ']')
+        except ValueError:
+            parsed = []
+            for value in raw:
+                try:
+                    parsed.append(json.loads(value))
+                except ValueError:
+                    continue
+        sheets.extend(sheet for sheet in parsed if isinstance(sheet, dict))
+    return sheets
+
+# Difficulty (share correct), point-biserial discrimination and option choice
+# rates per bank question, over the students who were given it, plus KR-20
+# when every student was given the same questions
+def analyze_items(matrix, on_paper, bank):
+    import numpy as np
+    
+    correct = (matrix == bank['answer_codes']) & on_paper
+    scores = correct.sum(axis=1).astype(float)
+    given = on_paper.astype(float)
+    given_to = on_paper.sum(axis=0)
+    right = correct.sum(axis=0).astype(float)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = given_to.astype(float)
+        p_values = right / n
+        # Correlation of each item with the rest of the test (the score
+        # without the item), from masked sums so it is one pass per moment
+        right_score_sum = correct.T.astype(float) @ scores
+        rest_mean = (given.T @ scores - right) / n
+        rest_var = (given.T @ scores ** 2 - 2 * right_score_sum + right) / n - rest_mean ** 2
+        covariance = (right_score_sum - right) / n - p_values * rest_mean
+        discrimination = covariance / np.sqrt(p_values * (1 - p_values) * rest_var)
+        choices = np.stack([
+            ((matrix == i + 1) & on_paper).sum(axis=0) for i in range(len(OPTION_LABELS))
+        ], axis=1) / n[:, None]
+        omitted = ((matrix == 0) & on_paper).sum(axis=0) / n
+    
+    kr20 = None
+    if len(matrix) > 1 and (on_paper == on_paper[0]).all():
+        items = on_paper[0]
+        k = int(items.sum())
+        total_variance = scores.var()
+        if k > 1 and total_variance > 0:
+            kr20 = float(k / (k - 1) * (1 - (p_values[items] * (1 - p_values[items])).sum() / total_variance))
+    
+    return {
+        'submissions': len(matrix),
+        'given_to': given_to,
+        'p_values': p_values,
+        'discrimination': discrimination,
+        'choices': choices,
+        'omitted': omitted,
+        'kr20': kr20,
+        'mean_score': float(scores.mean()) if len(scores) else 0.0
     }
+
+# Item analyses per test, recomputed only when the results or the bank change
+ITEM_ANALYSIS = PROCESS_STATE['item_analysis']
+
+def get_item_analysis(test_id):
+    bank = get_question_bank(test_id)
+    key = (get_storage(test_id).results_version(), bank['version'])
+    with ITEM_ANALYSIS['lock']:
+        entry = ITEM_ANALYSIS['tests'].get(test_id)
+        if entry is None or entry['key'] != key:
+            matrix, on_paper = build_answer_matrix(load_answer_sheets(test_id), bank)
+            entry = {'key': key, 'analysis': analyze_items(matrix, on_paper, bank)}
+            ITEM_ANALYSIS['tests'][test_id] = entry
+        return entry['analysis']
+
+# Grade a finished test, store it once and drop its progress. Shared by
+# submit_test and the expiry sweeper. `saved` is False when a result for the
+# matric number was already stored, so this one was not.
+def record_submission(test_id, bank, name, matric, answers, time_taken):
+    paper = build_paper(bank, get_test_settings(test_id), matric)
+    score, total, percentage = grade_answers(bank, paper, answers)
+    saved = save_result(test_id, name, matric, score, total, percentage, time_taken,
+                        build_answer_sheet(paper, answers), unique=True)
+    clear_progress(test_id, matric)
+    return score, total, percentage, saved
+
+# Submits tests left running by students who closed the browser. Deadlines sit
+# in a min-heap, so a pass only touches sessions that are actually due; each
+# test's progress store is listed (not read) to pick up sessions started elsewhere.
+# The same thread rolls old results into each test's archive.
+class ExpirySweeper:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heap = []
+        self.deadlines = {}
+        # The first archive check waits a full interval, off the start-up path
+        self.archived_at = time.time()
+        self.thread = threading.Thread(target=self.run, name="expiry-sweeper", daemon=True)
     
-    df = pd.read_csv(RESULTS_FILE)
-    df = pd.concat([df, pd.DataFrame([result])], ignore_index=True)
-    df.to_csv(RESULTS_FILE, index=False)
+    def start(self):
+        self.thread.start()
+    
+    def register(self, test_id, matric, deadline):
+        key = (test_id, matric)
+        with self.lock:
+            if self.deadlines.get(key) != deadline:
+                self.deadlines[key] = deadline
+                heapq.heappush(self.heap, (deadline, test_id, matric))
+    
+    def register_progress(self, test_id, matric, progress):
+        if progress and progress.get("start_time"):
+            duration = progress.get("test_duration", DEFAULT_TEST_DURATION)
+            self.register(test_id, matric, progress["start_time"] + duration)
+    
+    def discover(self):
+        with self.lock:
+            known = set(self.deadlines)
+        for test in load_tests():
+            storage = get_storage(test['id'])
+            for matric in storage.list_progress():
+                if (test['id'], matric) not in known:
+                    self.register_progress(test['id'], matric, storage.load_progress(matric))
+    
+    # Pop every session past deadline + grace and submit it
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] + EXPIRY_GRACE_SECONDS <= now:
+                deadline, test_id, matric = heapq.heappop(self.heap)
+                if self.deadlines.get((test_id, matric)) == deadline:
+                    del self.deadlines[(test_id, matric)]
+                    due.append((test_id, matric))
+        
+        submitted = 0
+        for test_id, matric in due:
+            progress = load_progress(test_id, matric)
+            if not progress or not progress.get("start_time"):
+                continue
+            duration = progress.get("test_duration", DEFAULT_TEST_DURATION)
+            if progress["start_time"] + duration + EXPIRY_GRACE_SECONDS > now:
+                # Restarted or extended since it was registered
+                self.register_progress(test_id, matric, progress)
+                continue
+            record_submission(
+                test_id,
+                get_question_bank(test_id),
+                progress.get("student_name") or matric,
+                matric,
+                progress.get("answers", {}),
+                int(duration)
+            )
+            submitted += 1
+        return submitted
+    
+    # Archive results older than RESULTS_ARCHIVE_AFTER_DAYS, at most once per
+    # RESULTS_ARCHIVE_CHECK_SECONDS
+    def archive_results(self, now=None):
+        now = time.time() if now is None else now
+        if RESULTS_ARCHIVE_AFTER_DAYS is None or not results_archive_available():
+            return 0
+        if now - self.archived_at < RESULTS_ARCHIVE_CHECK_SECONDS:
+            return 0
+        self.archived_at = now
+        before = (datetime.fromtimestamp(now) - timedelta(days=RESULTS_ARCHIVE_AFTER_DAYS)).date()
+        return sum(compact_results(test['id'], before) for test in load_tests())
+    
+    def run(self):
+        while True:
+            try:
+                self.discover()
+                self.sweep()
+                self.archive_results()
+            except Exception:
+                logger.exception("Expiry sweeper pass failed")
+            time.sleep(SWEEP_INTERVAL_SECONDS)
+
+# One sweeper thread per process, started by the first session
+def get_expiry_sweeper():
+    sweeper = PROCESS_STATE['sweeper']
+    if sweeper is None:
+        with PROCESS_STATE['lock']:
+            sweeper = PROCESS_STATE['sweeper']
+            if sweeper is None:
+                sweeper = ExpirySweeper()
+                if EXPIRY_SWEEPER_ENABLED:
+                    sweeper.start()
+                PROCESS_STATE['sweeper'] = sweeper
+    return sweeper
+
+# Test starts in flight (ticket -> admitted at) and the queue behind them
+# (ticket -> last poll), in arrival order
+ADMISSION = PROCESS_STATE['admission']
+
+# Free the slots and queue places of sessions that went away; at most once a second
+def expire_admissions(now):
+    if now - ADMISSION['expired_at'] < 1:
+        return
+    ADMISSION['expired_at'] = now
+    for ticket, admitted_at in list(ADMISSION['active'].items()):
+        if now - admitted_at > ADMISSION_SLOT_SECONDS:
+            del ADMISSION['active'][ticket]
+    for ticket, last_seen in list(ADMISSION['queue'].items()):
+        if now - last_seen > ADMISSION_QUEUE_TIMEOUT:
+            del ADMISSION['queue'][ticket]
+
+# Admit `ticket` when a slot is free and nobody queued before it, otherwise
+# keep its place. Returns 0 once admitted, else its place in the queue.
+def request_admission(ticket):
+    if ADMISSION_LIMIT <= 0:
+        return 0
+    now = time.time()
+    with ADMISSION['lock']:
+        if ticket in ADMISSION['active']:
+            return 0
+        expire_admissions(now)
+        queue = ADMISSION['queue']
+        queue[ticket] = now
+        free = ADMISSION_LIMIT - len(ADMISSION['active'])
+        for position, queued in enumerate(queue):
+            if queued == ticket:
+                break
+        if position < free:
+            del queue[ticket]
+            ADMISSION['active'][ticket] = now
+            return 0
+        return position - max(free, 0) + 1
+
+def release_admission(ticket):
+    with ADMISSION['lock']:
+        ADMISSION['active'].pop(ticket, None)
+        ADMISSION['queue'].pop(ticket, None)
+
+# The student's first test page is out; hand the slot to the next in line
+def finish_admission():
+    if st.session_state.admission_ticket:
+        release_admission(st.session_state.admission_ticket)
+        st.session_state.admission_ticket = None
 
 # Calculate remaining time
 def get_remaining_time():
@@ -145,6 +2764,30 @@ def get_remaining_time():
         return int(remaining)
     return st.session_state.test_duration
 
+# Live countdown in its own fragment: each tick reruns only this function,
+# never the question loop. At zero it triggers one full rerun, and show_test
+# enforces the expiry.
+@st.fragment(run_every=TIMER_REFRESH_SECONDS)
+def show_timer():
+    remaining_time = get_remaining_time()
+    if remaining_time <= 0 and not st.session_state.time_up:
+        st.rerun(scope="app")
+    
+    # Timer styling based on remaining time
+    if remaining_time > 600:
+        timer_class = "timer-normal"
+    elif remaining_time > 300:
+        timer_class = "timer-warning"
+    else:
+        timer_class = "timer-danger"
+    
+    st.markdown(f"""
+    <div class='timer-display {timer_class}'>
+        ⏱️ {format_time(remaining_time)}
+    </div>
+    """, unsafe_allow_html=True)
+    st.markdown("<p style='text-align: center; color: #666;'>Time Remaining</p>", unsafe_allow_html=True)
+
 # Format time
 def format_time(seconds):
     minutes = int(seconds // 60)
@@ -246,15 +2889,6 @@ def load_css():
 
 load_css()
 
-def has_taken_test(matric):
-    if not os.path.exists(RESULTS_FILE):
-        return False
-    try:
-        df = pd.read_csv(RESULTS_FILE)
-        return matric in df['Matric Number'].astype(str).values
-    except:
-        return False
-
 # Login Page
 def show_login():
     st.markdown("<h1 class='main-header'>📚 Student Test LMS</h1>", unsafe_allow_html=True)
@@ -265,38 +2899,32 @@ def show_login():
         st.markdown("### Student Login")
         st.write("Enter your details to start the test")
         
+        tests = open_tests()
+        if not tests:
+            st.info("No test is open right now. Please check back later.")
+        
         with st.form("login_form"):
             name = st.text_input("Full Name", placeholder="Enter your full name")
             matric = st.text_input("Matric Number", placeholder="Enter your matric number")
-            submit = st.form_submit_button("Start Test", use_container_width=True)
+            if len(tests) > 1:
+                test = st.selectbox("Test", tests, format_func=lambda t: t['title'])
+            else:
+                test = tests[0] if tests else None
+            submit = st.form_submit_button("Start Test", use_container_width=True, disabled=not tests)
             
             if submit:
                 if name and matric:
-                    if has_taken_test(matric):
+                    if has_taken_test(test['id'], matric):
                         st.error("❌ You have already completed this test.")
                         return
-
-                    progress = load_progress(matric)
-
-                    st.session_state.logged_in = True
-                    st.session_state.is_admin = False
-                    st.session_state.student_name = name
-                    st.session_state.matric_number = matric
-                    st.session_state.test_submitted = False
-                    st.session_state.time_up = False
-                    st.session_state.confirm_submit = False
-
-                    if progress:
-                        st.session_state.test_started = progress["test_started"]
-                        st.session_state.start_time = progress["start_time"]
-                        st.session_state.answers = progress["answers"]
-                        if "test_duration" in progress:
-                            st.session_state.test_duration = progress["test_duration"]
+                    
+                    # Over the start limit, wait for a slot; the clock has not started
+                    ticket = uuid.uuid4().hex
+                    st.session_state.admission_ticket = ticket
+                    if request_admission(ticket) == 0:
+                        start_student_session(test['id'], name, matric)
                     else:
-                        st.session_state.test_started = False
-                        st.session_state.answers = {}
-                        st.session_state.start_time = None
-
+                        st.session_state.waiting = {'test_id': test['id'], 'name': name, 'matric': matric}
                     st.rerun()
 
         
@@ -305,6 +2933,65 @@ def show_login():
             st.session_state.show_admin_login = True
             st.rerun()
 
+# Log a student in, resuming any saved progress; start_time stays unset for
+# a new test until show_test starts it
+def start_student_session(test_id, name, matric):
+    progress = load_progress(test_id, matric)
+    
+    st.session_state.test_id = test_id
+    st.session_state.logged_in = True
+    st.session_state.is_admin = False
+    st.session_state.student_name = name
+    st.session_state.matric_number = matric
+    st.session_state.test_submitted = False
+    st.session_state.time_up = False
+    st.session_state.confirm_submit = False
+    
+    if progress:
+        st.session_state.test_started = progress["test_started"]
+        st.session_state.start_time = progress["start_time"]
+        st.session_state.answers = progress["answers"]
+        if "test_duration" in progress:
+            st.session_state.test_duration = progress["test_duration"]
+        # Fold the replayed journal back into a single snapshot
+        save_progress(test_id, matric)
+    else:
+        st.session_state.test_started = False
+        st.session_state.answers = {}
+        st.session_state.start_time = None
+
+# Waiting Room
+def show_waiting_room():
+    waiting = st.session_state.waiting
+    if request_admission(st.session_state.admission_ticket) == 0:
+        st.session_state.waiting = None
+        start_student_session(waiting['test_id'], waiting['name'], waiting['matric'])
+        st.rerun()
+    
+    st.markdown("<h1 class='main-header'>⏳ Waiting Room</h1>", unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col2:
+        st.markdown(f"### 👤 {waiting['name']}")
+        st.write("Many students are starting at the same time. Your test opens automatically "
+                 "when it is your turn, and your time only starts then.")
+        show_queue_position()
+        
+        if st.button("Leave Queue", use_container_width=True):
+            release_admission(st.session_state.admission_ticket)
+            st.session_state.admission_ticket = None
+            st.session_state.waiting = None
+            st.rerun()
+
+# Polls for a slot on its own; a full rerun happens only once admitted
+@st.fragment(run_every=ADMISSION_POLL_SECONDS)
+def show_queue_position():
+    position = request_admission(st.session_state.admission_ticket)
+    if position == 0:
+        st.rerun(scope="app")
+    st.info(f"🎟️ You are number {position} in the queue")
+
 # Admin Login Page
 def show_admin_login():
     st.markdown("<h1 class='main-header'>🔐 Admin Login</h1>", unsafe_allow_html=True)
@@ -336,31 +3023,47 @@ def show_admin_login():
             st.rerun()
 
 # Test Page
+@instrumented('show_test')
 def show_test():
-    questions = load_questions()
+    test_id = st.session_state.test_id
+    bank = get_question_bank(test_id)
     
-    if not questions:
+    if not bank['questions']:
         st.error("No questions available. Please contact your instructor.")
         if st.button("Logout"):
             st.session_state.clear()
             st.rerun()
         return
     
-    # Start test
+    paper = get_session_paper(bank)
+    questions = paper['questions']
+    
+    # Start test; the clock stops at the test's duration or when its window closes
     if not st.session_state.test_started:
+        test = get_test(test_id)
+        if test is None or not is_test_open(test):
+            st.error("This test is closed.")
+            if st.button("Logout"):
+                st.session_state.clear()
+                st.rerun()
+            return
         st.session_state.test_started = True
         st.session_state.start_time = time.time()
-        save_progress(st.session_state.matric_number)
+        st.session_state.test_duration = test_time_allowed(test, st.session_state.start_time)
+        save_progress(test_id, st.session_state.matric_number)
+        get_expiry_sweeper().register(
+            test_id,
+            st.session_state.matric_number,
+            st.session_state.start_time + st.session_state.test_duration
+        )
     
     # Calculate remaining time
     remaining_time = get_remaining_time()
     
-    # Check if time is up
+    # Check if time is up; submit straight away, the notice is shown on the results page
     if remaining_time <= 0 and not st.session_state.time_up:
         st.session_state.time_up = True
-        st.warning("⏰ Time's up! Your test will be submitted automatically.")
-        time.sleep(2)
-        submit_test(questions)
+        submit_test(bank)
         return
     
     # Display header
@@ -371,20 +3074,7 @@ def show_test():
         st.write(f"**Matric Number:** {st.session_state.matric_number}")
     
     with col2:
-        # Timer styling based on remaining time
-        if remaining_time > 600:
-            timer_class = "timer-normal"
-        elif remaining_time > 300:
-            timer_class = "timer-warning"
-        else:
-            timer_class = "timer-danger"
-        
-        st.markdown(f"""
-        <div class='timer-display {timer_class}'>
-            ⏱️ {format_time(remaining_time)}
-        </div>
-        """, unsafe_allow_html=True)
-        st.markdown("<p style='text-align: center; color: #666;'>Time Remaining</p>", unsafe_allow_html=True)
+        show_timer()
     
     st.markdown("---")
     
@@ -404,14 +3094,25 @@ def show_test():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
             if st.button("✅ Yes, Submit Anyway", use_container_width=True, type="primary"):
-                submit_test(questions)
+                submit_test(bank)
         with col2:
             if st.button("❌ No, Continue Test", use_container_width=True):
                 st.session_state.confirm_submit = False
                 st.rerun()
     
+    # Only the current page's widgets are built; other answers stay in session state
+    page_size = QUESTIONS_PER_PAGE or len(questions)
+    page_count = (len(questions) + page_size - 1) // page_size
+    page = min(st.session_state.current_page, page_count - 1)
+    start = page * page_size
+    end = min(start + page_size, len(questions))
+    
+    if page_count > 1:
+        show_page_navigator(paper, page, page_count, page_size)
+    
     # Display questions
-    for idx, q in enumerate(questions):
+    for idx in range(start, end):
+        q = questions[idx]
         st.markdown(f"""
         <div class='question-card'>
             <p style='color: #667eea; font-weight: 600; margin-bottom: 0.5rem;'>
@@ -423,34 +3124,51 @@ def show_test():
         </div>
         """, unsafe_allow_html=True)
         
-        # Options
-        option_labels = ['A', 'B', 'C', 'D']
-        options_display = [f"{option_labels[i]}. {opt}" for i, opt in enumerate(q['options'])]
+        # Options, in paper order; answers are stored under the bank's labels
+        q_id = paper['ids'][idx]
+        options_display = paper['options_display'][idx]
+        order = paper['option_orders'][idx] if paper['option_orders'] else list(range(len(options_display)))
         
         # Get current answer if exists
-        current_answer = st.session_state.answers.get(str(q['id']), None)
+        current_answer = st.session_state.answers.get(q_id, None)
         current_index = None
         if current_answer:
             try:
-                current_index = option_labels.index(current_answer)
+                current_index = order.index(OPTION_LABELS.index(current_answer))
             except:
                 current_index = None
         
         answer = st.radio(
             f"Select your answer for Question {idx + 1}:",
             options=options_display,
-            key=f"q_{q['id']}",
+            key=f"q_{q_id}",
             index=current_index,
             label_visibility="collapsed"
         )
 
         if answer:
-            # Extract A, B, C, or D from "A. option text"
-            st.session_state.answers[str(q['id'])] = answer.split(".")[0]
-            save_progress(st.session_state.matric_number)
+            # Map the displayed option back to its bank label; only persist real changes
+            label = OPTION_LABELS[order[options_display.index(answer)]]
+            if st.session_state.answers.get(q_id) != label:
+                st.session_state.answers[q_id] = label
+                record_answer(test_id, st.session_state.matric_number, q_id, label)
         
         st.markdown("<br>", unsafe_allow_html=True)
     
+    if page_count > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if page > 0 and st.button("⬅️ Previous", use_container_width=True):
+                st.session_state.current_page = page - 1
+                st.rerun()
+        with col2:
+            st.markdown(f"<p style='text-align: center;'>Page {page + 1} of {page_count}</p>",
+                        unsafe_allow_html=True)
+        with col3:
+            if page < page_count - 1 and st.button("Next ➡️", use_container_width=True):
+                st.session_state.current_page = page + 1
+                st.rerun()
+    
     # Submit button
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -465,43 +3183,54 @@ def show_test():
                 st.rerun()
             else:
                 # Submit directly if all questions answered
-                submit_test(questions)
+                submit_test(bank)
 
-# Submit test function
-def submit_test(questions):
-    # Calculate score
-    score = 0
-    total = len(questions)
-    
-    for q in questions:
-        q_id = str(q['id'])
-        if q_id in st.session_state.answers:
-            if st.session_state.answers[q_id] == q['correct_answer']:
-                score += 1
+# Grid of page buttons, marked once every question on the page is answered
+def show_page_navigator(paper, page, page_count, page_size):
+    answers = st.session_state.answers
+    ids = paper['ids']
     
-    percentage = (score / total * 100) if total > 0 else 0
+    st.markdown(f"**Answered:** {len(answers)} of {len(ids)}")
+    for row_start in range(0, page_count, NAVIGATOR_COLUMNS):
+        cols = st.columns(NAVIGATOR_COLUMNS)
+        for offset, col in enumerate(cols):
+            p = row_start + offset
+            if p >= page_count:
+                break
+            first = p * page_size
+            last = min(first + page_size, len(ids))
+            label = f"{first + 1}" if page_size == 1 else f"{first + 1}-{last}"
+            if all(q_id in answers for q_id in ids[first:last]):
+                label = f"✓ {label}"
+            with col:
+                if st.button(label, key=f"nav_{p}", use_container_width=True,
+                             type="primary" if p == page else "secondary"):
+                    st.session_state.current_page = p
+                    st.rerun()
+    st.markdown("---")
+
+# Submit test function
+def submit_test(bank):
     time_taken = int(time.time() - st.session_state.start_time)
     
-    # Save result
-    save_result(
+    # Grade, save result and clear progress
+    score, total, percentage, saved = record_submission(
+        st.session_state.test_id,
+        bank,
         st.session_state.student_name,
         st.session_state.matric_number,
-        score,
-        total,
-        percentage,
+        st.session_state.answers,
         time_taken
     )
     
-    # Clear progress file
-    clear_progress(st.session_state.matric_number)
-    
     # Store results in session state
     st.session_state.test_submitted = True
     st.session_state.test_results_data = {
         'score': score,
         'total': total,
         'percentage': percentage,
-        'time_taken': time_taken
+        'time_taken': time_taken,
+        'saved': saved
     }
     
     # Rerun to show results
@@ -509,16 +3238,18 @@ def submit_test(questions):
 
 # Show results
 def show_results_page():
-    st.markdown("<h1 class='main-header'>✅ Test Submitted Successfully!</h1>", unsafe_allow_html=True)
-    
     # Get results from session state
     results = st.session_state.test_results_data
+    if results.get('saved', True):
+        st.markdown("<h1 class='main-header'>✅ Test Submitted Successfully!</h1>", unsafe_allow_html=True)
+    else:
+        st.markdown("<h1 class='main-header'>⚠️ Test Already Submitted</h1>", unsafe_allow_html=True)
     score = results['score']
     total = results['total']
     percentage = results['percentage']
     time_taken = results['time_taken']
     
-    passed = percentage >= 50
+    passed = percentage >= get_test_settings(st.session_state.test_id)['pass_mark']
     result_class = "result-passed" if passed else "result-failed"
     status_emoji = "✅" if passed else "❌"
     status_text = "PASSED" if passed else "FAILED"
@@ -526,38 +3257,43 @@ def show_results_page():
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
-        st.success("🎉 Your test has been submitted successfully!")
-        
-        st.markdown(f"""
-        <div class='result-card {result_class}'>
-            <h2 style="font-size: 2rem; margin-bottom: 1rem;">{status_emoji} {status_text}</h2>
-            <h1 style='font-size: 4rem; margin: 1rem 0;'>{score}/{total}</h1>
-            <h3 style="font-size: 2rem; margin: 1rem 0;">{percentage:.1f}%</h3>
-            <p style='margin-top: 1rem; font-size: 1.1rem;'>
-                {'Congratulations! You passed the test.' if passed else 'Unfortunately, you did not pass. Keep studying!'}
-            </p>
-            <p style='color: rgba(255,255,255,0.9); margin-top: 1rem;'>
-                Time taken: {format_time(time_taken)}
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Show answer summary
-        st.markdown("### 📊 Your Performance")
-        
-        # Calculate stats
-        questions = load_questions()
-        correct = score
-        incorrect = total - score
-        unanswered = total - len(st.session_state.answers)
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Correct Answers", f"{correct}", delta=f"{percentage:.1f}%")
-        with col2:
-            st.metric("Incorrect Answers", f"{incorrect}")
-        with col3:
-            st.metric("Time Taken", f"{format_time(time_taken)}")
+        if not results.get('saved', True):
+            st.error("❌ A result for your matric number was already recorded, so this submission was not saved. "
+                     "Please contact your lecturer if you think this is a mistake.")
+        else:
+            if st.session_state.time_up:
+                st.warning("⏰ Time's up! Your test was submitted automatically.")
+            st.success("🎉 Your test has been submitted successfully!")
+            
+            st.markdown(f"""
+            <div class='result-card {result_class}'>
+                <h2 style="font-size: 2rem; margin-bottom: 1rem;">{status_emoji} {status_text}</h2>
+                <h1 style='font-size: 4rem; margin: 1rem 0;'>{score}/{total}</h1>
+                <h3 style="font-size: 2rem; margin: 1rem 0;">{percentage:.1f}%</h3>
+                <p style='margin-top: 1rem; font-size: 1.1rem;'>
+                    {'Congratulations! You passed the test.' if passed else 'Unfortunately, you did not pass. Keep studying!'}
+                </p>
+                <p style='color: rgba(255,255,255,0.9); margin-top: 1rem;'>
+                    Time taken: {format_time(time_taken)}
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Show answer summary
+            st.markdown("### 📊 Your Performance")
+            
+            # Calculate stats
+            correct = score
+            incorrect = total - score
+            unanswered = total - len(st.session_state.answers)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Correct Answers", f"{correct}", delta=f"{percentage:.1f}%")
+            with col2:
+                st.metric("Incorrect Answers", f"{incorrect}")
+            with col3:
+                st.metric("Time Taken", f"{format_time(time_taken)}")
         
         st.markdown("---")
         
@@ -571,31 +3307,169 @@ def show_admin_dashboard():
     st.sidebar.title("📊 Admin Dashboard")
     st.sidebar.markdown(f"**Logged in as:** {st.session_state.student_name}")
     
+    # Questions, results and settings below apply to the selected test
+    tests = load_tests()
+    test_ids = [test['id'] for test in tests]
+    titles = {test['id']: f"{test['title']} ({test['id']})" for test in tests}
+    if st.session_state.test_id not in test_ids:
+        st.session_state.test_id = test_ids[0]
+    st.session_state.test_id = st.sidebar.selectbox(
+        "Test",
+        test_ids,
+        index=test_ids.index(st.session_state.test_id),
+        format_func=titles.get
+    )
+    
     menu = st.sidebar.radio(
         "Navigation",
-        ["Manage Questions", "View Results", "Settings"]
+        ["Manage Tests", "Manage Questions", "View Results", "Item Analysis", "Live Monitor", "Performance", "Settings"]
     )
     
     if st.sidebar.button("Logout"):
         st.session_state.clear()
         st.rerun()
     
-    if menu == "Manage Questions":
+    if menu == "Manage Tests":
+        show_test_management()
+    elif menu == "Manage Questions":
         show_question_management()
     elif menu == "View Results":
         show_results_dashboard()
+    elif menu == "Item Analysis":
+        show_item_analysis()
+    elif menu == "Live Monitor":
+        show_live_monitor()
+    elif menu == "Performance":
+        show_performance()
     elif menu == "Settings":
         show_settings()
 
+# Test Management
+def show_test_management():
+    import pandas as pd
+    
+    st.markdown("<h1 class='main-header'>🗓️ Manage Tests</h1>", unsafe_allow_html=True)
+    
+    tests = load_tests()
+    st.dataframe(pd.DataFrame([
+        {
+            'ID': test['id'],
+            'Title': test['title'],
+            'Duration (min)': test.get('duration', DEFAULT_TEST_DURATION) // 60,
+            'Opens': test.get('opens_at') or 'Always',
+            'Closes': test.get('closes_at') or 'Never',
+            'Status': 'Open' if is_test_open(test) else 'Closed'
+        }
+        for test in tests
+    ]), use_container_width=True, hide_index=True)
+    
+    st.markdown("### Add or Update a Test")
+    st.info("Times use the format YYYY-MM-DD HH:MM; leave them blank for no limit. "
+            "Saving an existing ID updates that test.")
+    
+    with st.form("test_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            test_id = st.text_input("Test ID", placeholder="e.g. bio101-week3")
+            opens_at = st.text_input("Opens at", placeholder="2024-01-31 09:00")
+            duration_minutes = st.number_input("Duration (minutes)", min_value=MIN_TEST_DURATION_MINUTES,
+                                               max_value=MAX_TEST_DURATION_MINUTES,
+                                               value=DEFAULT_TEST_DURATION // 60)
+        with col2:
+            title = st.text_input("Title", placeholder="e.g. BIO 101 Week 3 Quiz")
+            closes_at = st.text_input("Closes at", placeholder="2024-01-31 17:00")
+        
+        if st.form_submit_button("Save Test", use_container_width=True):
+            test_id = test_id.strip().lower()
+            try:
+                opens = parse_test_time(opens_at.strip())
+                closes = parse_test_time(closes_at.strip())
+            except ValueError:
+                st.error("Times must use the format YYYY-MM-DD HH:MM")
+                return
+            if not test_id or not all(c.isalnum() or c in '-_' for c in test_id):
+                st.error("Test ID may only contain letters, digits, '-' and '_'")
+            elif not title.strip():
+                st.error("Please enter a title")
+            elif opens and closes and closes <= opens:
+                st.error("The test must close after it opens")
+            else:
+                test = dict(
+                    get_test(test_id) or new_test(test_id, title.strip()),
+                    title=title.strip(),
+                    duration=int(duration_minutes) * 60,
+                    opens_at=opens_at.strip() or None,
+                    closes_at=closes_at.strip() or None
+                )
+                save_test(test)
+                st.success(f"Test '{test['title']}' saved")
+                st.rerun()
+    
+    st.markdown("### Remove a Test")
+    st.caption("Removing a test hides it from students and admins; its questions and results stay on disk.")
+    removable = [test['id'] for test in tests if test['id'] != DEFAULT_TEST_ID]
+    if removable:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            remove_id = st.selectbox("Test to remove", removable, label_visibility="collapsed")
+        with col2:
+            if st.button("Remove", use_container_width=True):
+                remove_test(remove_id)
+                st.rerun()
+    else:
+        st.write("Only the default test exists.")
+
 # Question Management
 def show_question_management():
+    import pandas as pd
+    
     st.markdown("<h1 class='main-header'>📝 Manage Questions</h1>", unsafe_allow_html=True)
     
     tab1, tab2 = st.tabs(["Bulk Upload", "Current Questions"])
     
     with tab1:
-        st.markdown("### Bulk Upload Questions")
-        st.info("Upload multiple questions at once using JSON format")
+        st.markdown("### Import from File")
+        st.info("Import a JSON Lines, CSV or Excel file. Questions are merged into the bank by id: "
+                "existing ids are updated and new ids are added.")
+        
+        with st.expander("📋 View File Formats"):
+            st.markdown("**JSON Lines** (`.jsonl`): one question object per line")
+            st.code('{"id": 1, "question": "What is 2 + 2?", "options": ["3", "4", "5", "6"], "correct_answer": "B"}',
+                    language="json")
+            st.markdown("**CSV / Excel** (`.csv`, `.xlsx`): a header row, then one question per row")
+            st.code(f"id,question,{','.join(QUESTION_OPTION_COLUMNS)},correct_answer\n"
+                    "1,What is 2 + 2?,3,4,5,6,B", language=None)
+        
+        uploaded_file = st.file_uploader("Question file", type=QUESTION_IMPORT_FORMATS)
+        skip_invalid = st.checkbox("Import valid rows even if some rows have errors")
+        
+        if st.button("Import Questions", use_container_width=True, disabled=uploaded_file is None):
+            file_format = uploaded_file.name.rsplit('.', 1)[-1].lower()
+            try:
+                with st.spinner("Reading questions..."):
+                    imported = read_question_file(uploaded_file, file_format)
+            except Exception as e:
+                st.error(f"Could not read {uploaded_file.name}: {str(e)}")
+            else:
+                if imported['error_count']:
+                    st.warning(f"{imported['error_count']} of {imported['rows']} rows have errors")
+                    st.dataframe(pd.DataFrame(imported['errors']), use_container_width=True, hide_index=True)
+                    if imported['error_count'] > len(imported['errors']):
+                        st.caption(f"Showing the first {len(imported['errors'])} errors")
+                
+                if not imported['questions']:
+                    st.error("No valid questions found")
+                elif imported['error_count'] and not skip_invalid:
+                    st.error("Nothing imported. Fix the rows above or choose to import valid rows only.")
+                else:
+                    added, updated = merge_questions(st.session_state.test_id, imported['questions'])
+                    st.success(f"✅ {len(imported['questions'])} questions imported "
+                               f"({added} new, {updated} updated)")
+        
+        st.markdown("---")
+        
+        st.markdown("### Paste Questions")
+        st.info("Replace the whole bank with questions in JSON format")
         
         with st.expander("📋 View Example Format"):
             st.code("""[
@@ -632,7 +3506,7 @@ def show_question_management():
                             st.error("Each question must have: id, question, options, correct_answer")
                             return
                     
-                    save_questions(questions)
+                    save_questions(st.session_state.test_id, questions)
                     st.success(f"✅ {len(questions)} questions uploaded successfully!")
                     
             except json.JSONDecodeError:
@@ -642,7 +3516,7 @@ def show_question_management():
     
     with tab2:
         st.markdown("### Current Questions")
-        questions = load_questions()
+        questions = load_questions(st.session_state.test_id)
         
         if not questions:
             st.info("No questions available. Upload questions to get started.")
@@ -653,71 +3527,355 @@ def show_question_management():
                 with st.expander(f"Question {idx + 1} (ID: {q['id']})"):
                     st.markdown(f"**Question:** {q['question']}")
                     st.markdown("**Options:**")
-                    option_labels = ['A', 'B', 'C', 'D']
                     for i, opt in enumerate(q['options']):
-                        is_correct = option_labels[i] == q['correct_answer']
+                        is_correct = OPTION_LABELS[i] == q['correct_answer']
                         prefix = "✅" if is_correct else "⚪"
-                        st.markdown(f"{prefix} {option_labels[i]}. {opt}")
+                        st.markdown(f"{prefix} {OPTION_LABELS[i]}. {opt}")
 
 # Results Dashboard
 def show_results_dashboard():
+    import pandas as pd
+    
     st.markdown("<h1 class='main-header'>📈 Student Results</h1>", unsafe_allow_html=True)
     
+    test_id = st.session_state.test_id
     try:
-        df = pd.read_csv(RESULTS_FILE)
+        stats = get_results_stats(test_id)
         
-        if df.empty:
+        if stats['count'] == 0:
             st.info("No test results yet.")
         else:
-            # Statistics
+            # Statistics, from the running aggregates
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Total Submissions", len(df))
+                st.metric("Total Submissions", stats['count'])
             with col2:
-                st.metric("Average Score", f"{df['Percentage'].mean():.1f}%")
+                average = stats['percentage_sum'] / stats['percentage_count'] if stats['percentage_count'] else 0
+                st.metric("Average Score", f"{average:.1f}%")
             with col3:
-                pass_rate = (df['Percentage'] >= 50).sum() / len(df) * 100
+                pass_rate = count_passes(stats, get_test_settings(test_id)['pass_mark']) / stats['count'] * 100
                 st.metric("Pass Rate", f"{pass_rate:.1f}%")
             with col4:
-                avg_time = df['Time Taken (seconds)'].mean() / 60
+                avg_time = stats['time_sum'] / stats['time_count'] / 60 if stats['time_count'] else 0
                 st.metric("Avg Time", f"{avg_time:.1f} min")
             
+            bin_width = 100 // HISTOGRAM_BINS
+            st.bar_chart(pd.DataFrame(
+                {'Students': score_bands(stats)},
+                index=[f"{i * bin_width:02d}-{i * bin_width + bin_width - 1}%" for i in range(HISTOGRAM_BINS)]
+            ))
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("🔍 Check Aggregates", use_container_width=True):
+                    mismatches = check_results_stats(test_id)
+                    if mismatches:
+                        st.warning(f"Aggregates out of date: {mismatches}")
+                    else:
+                        st.success("Aggregates match the results file")
+            with col2:
+                if st.button("♻️ Rebuild Aggregates", use_container_width=True):
+                    invalidate_results_index(test_id)
+                    st.rerun()
+            
             st.markdown("---")
             
             # Results table
             st.markdown("### All Results")
-            st.dataframe(df, use_container_width=True)
+            show_results_table(test_id)
             
-            # Download button
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Results (CSV)",
-                data=csv,
-                file_name=f"test_results_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+            # Download buttons; the export is only generated when clicked
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="📥 Download Results (CSV)",
+                    data=lambda: read_results_export(test_id, 'csv'),
+                    file_name=f"test_results_{test_id}_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    on_click="ignore",
+                    use_container_width=True
+                )
+            with col2:
+                st.download_button(
+                    label="📥 Download Results (Excel)",
+                    data=lambda: read_results_export(test_id, 'xlsx'),
+                    file_name=f"test_results_{test_id}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click="ignore",
+                    use_container_width=True
+                )
+            
+            st.markdown("---")
+            st.markdown("### Regrade")
+            st.info("Re-score every stored answer sheet against this test's current answer key")
+            if st.button("🔁 Regrade All", use_container_width=True):
+                started = time.perf_counter()
+                regraded, changed = regrade_results(test_id)
+                elapsed = (time.perf_counter() - started) * 1000
+                st.success(f"Regraded {regraded} submissions in {elapsed:.0f} ms ({changed} scores changed)")
             
     except Exception as e:
         st.error(f"Error loading results: {str(e)}")
 
+# Filterable, sortable results table; only the visible page is loaded
+def show_results_table(test_id):
+    with st.expander("🔎 Filter & Sort"):
+        with st.form("results_filter"):
+            col1, col2 = st.columns(2)
+            with col1:
+                matric = st.text_input("Matric Number contains", key="filter_matric")
+                date_from = st.date_input("From date", value=None, key="filter_date_from")
+                sort_by = st.selectbox("Sort by", RESULTS_SORT_COLUMNS, key="filter_sort_by")
+            with col2:
+                name = st.text_input("Name contains", key="filter_name")
+                date_to = st.date_input("To date", value=None, key="filter_date_to")
+                order = st.radio("Order", ["Descending", "Ascending"], horizontal=True, key="filter_order")
+            score_band = st.slider("Score band (%)", 0, 100, (0, 100), key="filter_score_band")
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="filter_page_size")
+            if st.form_submit_button("Apply", use_container_width=True):
+                st.session_state.results_page = 1
+    
+    filters = {
+        'matric': matric,
+        'name': name,
+        'date_from': date_from,
+        'date_to': date_to,
+        'score_band': score_band
+    }
+    
+    if 'results_page' not in st.session_state:
+        st.session_state.results_page = 1
+    page_df, total = query_results(
+        test_id,
+        filters,
+        sort_by=sort_by,
+        ascending=order == "Ascending",
+        page=st.session_state.results_page - 1,
+        page_size=page_size
+    )
+    page_count = max(1, (total + page_size - 1) // page_size)
+    if st.session_state.results_page > page_count:
+        # The filter shrank the result set below the current page
+        st.session_state.results_page = page_count
+        st.rerun()
+    
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input("Page", min_value=1, max_value=page_count, step=1, key="results_page")
+    with col2:
+        st.markdown(f"<p style='margin-top: 2rem;'>{total} matching result(s), page size {page_size}, "
+                    f"{page_count} page(s)</p>", unsafe_allow_html=True)
+
+# Item Analysis
+def show_item_analysis():
+    import pandas as pd
+    
+    st.markdown("<h1 class='main-header'>🔎 Item Analysis</h1>", unsafe_allow_html=True)
+    
+    test_id = st.session_state.test_id
+    bank = get_question_bank(test_id)
+    analysis = get_item_analysis(test_id)
+    
+    if not bank['questions'] or analysis['submissions'] == 0:
+        st.info("No submissions with stored answers yet.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Submissions", analysis['submissions'])
+    with col2:
+        st.metric("Questions", len(bank['questions']))
+    with col3:
+        st.metric("Mean Score", f"{analysis['mean_score']:.1f}")
+    with col4:
+        st.metric("KR-20", f"{analysis['kr20']:.2f}" if analysis['kr20'] is not None else "–")
+    if analysis['kr20'] is None:
+        st.caption("KR-20 needs two or more submissions, all given the same questions, whose scores vary.")
+    
+    rows = []
+    for idx, q in enumerate(bank['questions']):
+        p_value = analysis['p_values'][idx]
+        discrimination = analysis['discrimination'][idx]
+        flags = []
+        if p_value < ITEM_HARD_P:
+            flags.append("Too hard")
+        elif p_value > ITEM_EASY_P:
+            flags.append("Too easy")
+        if discrimination < ITEM_LOW_DISCRIMINATION:
+            flags.append("Weak discrimination")
+        row = {
+            'ID': bank['ids'][idx],
+            'Question': q['question'] if len(q['question']) <= 60 else q['question'][:57] + "...",
+            'Key': bank['answer_key'][idx],
+            'Given To': int(analysis['given_to'][idx]),
+            'Difficulty (p)': round(float(p_value), 3),
+            'Discrimination': round(float(discrimination), 3)
+        }
+        for i, label in enumerate(OPTION_LABELS):
+            row[f"{label} %"] = round(float(analysis['choices'][idx, i]) * 100, 1)
+        row['Omitted %'] = round(float(analysis['omitted'][idx]) * 100, 1)
+        row['Flags'] = ", ".join(flags)
+        rows.append(row)
+    
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    st.caption("Difficulty is the share of students given a question who answered it correctly. "
+               "Discrimination is its point-biserial correlation with the rest of the test. "
+               "Option columns show how often each option was chosen; the key is the correct one.")
+
+# Live Monitor
+def show_live_monitor():
+    st.markdown("<h1 class='main-header'>📡 Live Monitor</h1>", unsafe_allow_html=True)
+    show_live_sessions(st.session_state.test_id)
+
+# Refreshes on its own; only progress changed since the last tick is re-read
+@st.fragment(run_every=LIVE_MONITOR_REFRESH_SECONDS)
+def show_live_sessions(test_id):
+    import pandas as pd
+    
+    summaries = get_progress_summaries(test_id)
+    now = time.time()
+    
+    bank_size = len(get_question_bank(test_id)['ids'])
+    questions_per_test = get_test_settings(test_id)['questions_per_test']
+    paper_size = min(questions_per_test, bank_size) if questions_per_test else bank_size
+    
+    rows = []
+    for summary in summaries:
+        if summary['start_time'] is None:
+            continue
+        remaining = max(0, summary['start_time'] + summary['test_duration'] - now)
+        idle = max(0, now - summary['updated_at'])
+        if remaining <= 0:
+            status = "Time up"
+        elif idle >= LIVE_IDLE_SECONDS:
+            status = "Idle"
+        else:
+            status = "Answering"
+        rows.append({
+            'Student': summary['student_name'],
+            'Matric Number': summary['matric'],
+            'Answered': summary['answered'],
+            'Questions': paper_size,
+            'Remaining': remaining,
+            'Time Left': format_time(remaining),
+            'Idle': format_time(idle),
+            'Status': status
+        })
+    
+    if not rows:
+        st.info("No students are taking this test right now.")
+        return
+    
+    df = pd.DataFrame(rows).sort_values('Remaining')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("In Progress", int((df['Status'] != "Time up").sum()))
+    with col2:
+        st.metric("Average Answered", f"{df['Answered'].mean():.1f} / {paper_size}")
+    with col3:
+        st.metric("Idle", int((df['Status'] == "Idle").sum()))
+    
+    st.dataframe(df.drop(columns='Remaining'), use_container_width=True, hide_index=True)
+    st.caption(f"Refreshes every {LIVE_MONITOR_REFRESH_SECONDS} seconds. Idle means no answer saved "
+               f"for {LIVE_IDLE_SECONDS // 60} minutes.")
+
+# Performance
+def show_performance():
+    st.markdown("<h1 class='main-header'>⏱️ Performance</h1>", unsafe_allow_html=True)
+    
+    snapshot = get_perf_snapshot()
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    percentiles = snapshot['rerun_percentiles']
+    with col1:
+        st.metric("Active Sessions", snapshot['active_sessions'])
+    with col2:
+        st.metric("Writes / sec", f"{snapshot['writes_per_second']:.2f}")
+    with col3:
+        st.metric("Rerun p50", f"{percentiles[0]:.0f} ms" if percentiles else "–")
+    with col4:
+        st.metric("Rerun p95", f"{percentiles[1]:.0f} ms" if percentiles else "–")
+    with col5:
+        st.metric("Rerun p99", f"{percentiles[2]:.0f} ms" if percentiles else "–")
+    st.caption(f"Sessions and writes over the last {PERF_WINDOW_SECONDS} seconds, in this server process")
+    if ADMISSION_LIMIT > 0:
+        with ADMISSION['lock']:
+            starting, waiting = len(ADMISSION['active']), len(ADMISSION['queue'])
+        st.caption(f"Test starts: {starting} of {ADMISSION_LIMIT} slots in use, {waiting} student(s) in the waiting room")
+    
+    st.markdown("### Time per Function")
+    if snapshot['functions'].empty:
+        st.info("No timings recorded yet.")
+    else:
+        st.dataframe(snapshot['functions'], use_container_width=True, hide_index=True)
+        st.caption("Times include nested calls: main covers show_test, which covers save_progress.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔄 Refresh", use_container_width=True):
+            st.rerun()
+    with col2:
+        if st.button("🧹 Reset Counters", use_container_width=True):
+            reset_perf_registry()
+            st.rerun()
+    
+    st.markdown("---")
+    
+    st.markdown("### Profile a Rerun")
+    if st.button("🔬 Profile Next Rerun"):
+        request_profile()
+        st.info("The next rerun in any session will be profiled. Refresh to see the report.")
+    
+    profile = PERF_REGISTRY['profile']
+    if profile:
+        st.caption(f"Captured at {profile['captured_at']}")
+        st.code(profile['report'], language=None)
+
 # Settings
 def show_settings():
     st.markdown("<h1 class='main-header'>⚙️ Settings</h1>", unsafe_allow_html=True)
     
-    st.markdown("### Test Duration")
-    duration_minutes = st.number_input(
-        "Test duration (minutes)",
-        min_value=5,
-        max_value=180,
-        value=30,
-        step=5
-    )
+    test = get_test_settings(st.session_state.test_id)
     
-    if st.button("Save Duration"):
-        st.session_state.test_duration = duration_minutes * 60
-        st.success(f"Test duration set to {duration_minutes} minutes")
+    # Saved to the shared configuration, so students on every server process get it.
+    # The stored duration is only replaced when the field is edited, so one
+    # that is not in whole minutes or within the form's bounds survives.
+    shown_minutes = min(MAX_TEST_DURATION_MINUTES, max(MIN_TEST_DURATION_MINUTES, test['duration'] // 60))
+    st.markdown(f"### Settings for {test['title']}")
+    with st.form("test_settings"):
+        col1, col2 = st.columns(2)
+        with col1:
+            duration_minutes = st.number_input(
+                "Test duration (minutes)",
+                min_value=MIN_TEST_DURATION_MINUTES,
+                max_value=MAX_TEST_DURATION_MINUTES,
+                value=shown_minutes
+            )
+            questions_per_test = st.number_input(
+                "Questions per student (0 = every question)",
+                min_value=0,
+                value=int(test['questions_per_test'])
+            )
+        with col2:
+            pass_mark = st.number_input("Pass mark (%)", min_value=0, max_value=100, value=int(test['pass_mark']))
+            stratify_by_tag = st.checkbox("Draw questions in proportion to their tags",
+                                          value=test['stratify_by_tag'])
+            shuffle_options = st.checkbox("Shuffle the options of each question", value=test['shuffle_options'])
+        st.caption("Changing how papers are drawn during a test changes the papers of students already taking it.")
+        
+        if st.form_submit_button("Save Settings", use_container_width=True):
+            save_test(dict(
+                test,
+                duration=test['duration'] if duration_minutes == shown_minutes else int(duration_minutes) * 60,
+                pass_mark=int(pass_mark),
+                questions_per_test=int(questions_per_test),
+                stratify_by_tag=stratify_by_tag,
+                shuffle_options=shuffle_options
+            ))
+            st.success("Settings saved")
     
     st.markdown("---")
     
@@ -737,30 +3895,56 @@ def show_settings():
                     'username': new_username,
                     'password': new_password
                 }
-                with open(ADMIN_CREDENTIALS_FILE, 'w') as f:
-                    json.dump(credentials, f)
+                save_admin_credentials(credentials)
                 st.success("Credentials updated successfully!")
             else:
                 st.error("Please fill in all fields")
     
     st.markdown("---")
     
+    # Old terms are archived rather than cleared; the archive stays in every
+    # dashboard and export
+    st.markdown("### Results Archive")
+    if results_archive_available():
+        partitions = get_archive_partitions(st.session_state.test_id)
+        if partitions:
+            st.caption(f"{sum(p['rows'] for p in partitions)} results archived over {len(partitions)} days")
+            st.dataframe(partitions, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nothing archived yet")
+        if RESULTS_ARCHIVE_AFTER_DAYS is not None:
+            st.caption(f"Results older than {RESULTS_ARCHIVE_AFTER_DAYS} days are archived automatically.")
+        with st.form("archive_results"):
+            before = st.date_input("Archive results submitted before",
+                                   value=datetime.now().date() - timedelta(days=RESULTS_ARCHIVE_AFTER_DAYS or 0))
+            if st.form_submit_button("Archive Results", use_container_width=True):
+                moved = compact_results(st.session_state.test_id, before)
+                st.success(f"Archived {moved} results")
+    else:
+        st.info("Archiving results needs the file storage backend and pyarrow (pip install pyarrow).")
+    
+    st.markdown("---")
+    
     st.markdown("### Danger Zone")
     if st.button("Clear All Results", type="secondary"):
-        if st.checkbox("I understand this will delete all results"):
-            df = pd.DataFrame(columns=['Timestamp', 'Student Name', 'Matric Number', 
-                                       'Score', 'Total Questions', 'Percentage', 'Time Taken (seconds)'])
-            df.to_csv(RESULTS_FILE, index=False)
+        if st.checkbox("I understand this will delete all results for this test, archived ones included"):
+            clear_results(st.session_state.test_id)
             st.success("All results cleared")
             st.rerun()
 
 # Main App Logic
+@instrumented('main')
 def main():
+    get_expiry_sweeper()
+    mark_session_active()
+    
     if 'show_admin_login' not in st.session_state:
         st.session_state.show_admin_login = False
     
     if not st.session_state.logged_in:
-        if st.session_state.show_admin_login:
+        if st.session_state.waiting:
+            show_waiting_room()
+        elif st.session_state.show_admin_login:
             show_admin_login()
         else:
             show_login()
@@ -772,6 +3956,10 @@ def main():
                 show_results_page()
             else:
                 show_test()
+            finish_admission()
 
 if __name__ == "__main__":
-    main()
+    if take_profile_request():
+        run_profiled(main)
+    else:
+        main()
@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+logging.disable(logging.WARNING)
+
+import my_lecture_dashboard as app  # noqa: E402
+
+
+def open_file_storage(root):
+    storage = app.FileStorage(
+        os.path.join(root, app.QUESTIONS_FILE),
+        os.path.join(root, app.RESULTS_FILE),
+        os.path.join(root, app.PROGRESS_DIR),
+        os.path.join(root, app.ADMIN_CREDENTIALS_FILE),
+        os.path.join(root, app.CONFIG_FILE),
+        os.path.join(root, app.RESULTS_ARCHIVE_DIR)
+    )
+    storage.initialize()
+    return storage
+
+
+def open_sqlite_storage(root):
+    storage = app.SQLiteStorage(os.path.join(root, app.SQLITE_FILE))
+    storage.initialize()
+    return storage
+
+
+# One row of the results log, in RESULTS_COLUMNS order
+def result_row(matric, timestamp='2024-01-01 10:00:00', score=5, total=10, percentage=50.0,
+               time_taken=60, answers=None):
+    return [
+        timestamp,
+        f'Student {matric}',
+        matric,
+        score,
+        total,
+        percentage,
+        time_taken,
+        json.dumps(answers, separators=(',', ':')) if answers is not None else ''
+    ]
+
+
+OPENERS = {'file': open_file_storage, 'sqlite': open_sqlite_storage}
+
+
+# Hides pyarrow, as on an install without the optional extras. pandas has
+# already found it by now, so its strings are switched back to Python storage.
+@pytest.fixture
+def without_pyarrow(monkeypatch):
+    import pandas as pd
+
+    for name in list(sys.modules):
+        if name.startswith('pyarrow.'):
+            monkeypatch.setitem(sys.modules, name, None)
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pd.option_context('mode.string_storage', 'python'):
+        yield
+
+
+@pytest.fixture
+def file_storage(tmp_path):
+    return open_file_storage(str(tmp_path))
+
+
+# Opens the store for one backend; calling it again opens a second handle on
+# the same store, as another server process would. The file backend also
+# runs without pyarrow, which it only needs for archived results.
+@pytest.fixture(params=['file', 'file-without-pyarrow', 'sqlite'])
+def open_storage(request, tmp_path):
+    backend = request.param
+    if backend == 'file-without-pyarrow':
+        request.getfixturevalue('without_pyarrow')
+        backend = 'file'
+    return lambda: OPENERS[backend](str(tmp_path))
+
+
+@pytest.fixture
+def storage(open_storage):
+    return open_storage()
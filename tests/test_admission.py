@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+import my_lecture_dashboard as app
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app, 'time', SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setitem(app.ADMISSION, 'active', {})
+    monkeypatch.setitem(app.ADMISSION, 'queue', {})
+    monkeypatch.setitem(app.ADMISSION, 'expired_at', 0)
+    return now
+
+
+def test_queue_is_first_come_first_served(clock, monkeypatch):
+    monkeypatch.setattr(app, 'ADMISSION_LIMIT', 2)
+    assert [app.request_admission(ticket) for ticket in 'abcde'] == [0, 0, 1, 2, 3]
+    assert app.request_admission('c') == 1
+
+    app.release_admission('a')
+    app.release_admission('b')
+
+    # e polls first but still waits behind c and d
+    assert app.request_admission('e') == 1
+    assert app.request_admission('d') == 0
+    assert app.request_admission('c') == 0
+    assert app.request_admission('e') == 1
+    assert set(app.ADMISSION['active']) == {'c', 'd'}
+
+
+def test_stale_slots_and_queue_places_expire(clock, monkeypatch):
+    monkeypatch.setattr(app, 'ADMISSION_LIMIT', 1)
+    assert [app.request_admission(ticket) for ticket in 'abc'] == [0, 1, 2]
+
+    # c keeps polling, b's tab went away, a never finished its first page
+    for elapsed in range(5, app.ADMISSION_SLOT_SECONDS, 5):
+        clock[0] = 1000.0 + elapsed
+        assert app.request_admission('c') == (2 if elapsed <= app.ADMISSION_QUEUE_TIMEOUT else 1)
+    clock[0] = 1000.0 + app.ADMISSION_SLOT_SECONDS + 1
+
+    assert app.request_admission('c') == 0
+    assert app.request_admission('b') == 1
+    assert 'a' not in app.ADMISSION['active']
+
+
+def test_no_limit_admits_everyone(clock, monkeypatch):
+    monkeypatch.setattr(app, 'ADMISSION_LIMIT', 0)
+    assert [app.request_admission(ticket) for ticket in 'abc'] == [0, 0, 0]
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import my_lecture_dashboard as app
+from conftest import result_row
+
+QUESTIONS = [{'id': i, 'question': f'Q{i}?', 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 'B'}
+             for i in range(1, 4)]
+
+
+# The app's process-wide store, over an empty working directory
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(app.STORAGE_REGISTRY, 'shards', {})
+    monkeypatch.setitem(app.QUESTION_BANK_CACHES, 'caches', {})
+    monkeypatch.setitem(app.CONFIG_CACHE, 'config', None)
+    monkeypatch.setitem(app.CONFIG_CACHE, 'version', None)
+    app.save_questions(app.DEFAULT_TEST_ID, QUESTIONS)
+    return app.get_storage(app.DEFAULT_TEST_ID)
+
+
+def start(storage, matric, started, answers=None):
+    storage.save_progress(matric, {
+        'student_name': f'Student {matric}',
+        'start_time': started,
+        'test_duration': 600,
+        'answers': answers or {},
+        'test_started': True
+    })
+
+
+def test_expired_session_is_submitted_once(store):
+    now = time.time()
+    start(store, 'M1', now - 1000, {'1': 'B', '2': 'A'})
+    start(store, 'M2', now - 10)
+    sweeper = app.ExpirySweeper()
+    sweeper.discover()
+
+    assert sweeper.sweep(now) == 1
+
+    df = store.load_results()
+    assert df['Matric Number'].astype(str).tolist() == ['M1']
+    assert [int(df[column][0]) for column in ['Score', 'Total Questions', 'Time Taken (seconds)']] == [1, 3, 600]
+    assert store.list_progress() == ['M2']
+    assert sweeper.sweep(now) == 0
+
+
+def test_extended_session_is_not_submitted(store):
+    now = time.time()
+    start(store, 'M1', now - 1000)
+    sweeper = app.ExpirySweeper()
+    sweeper.discover()
+
+    start(store, 'M1', now - 10)
+
+    assert sweeper.sweep(now) == 0
+    assert store.load_results().empty
+    assert sweeper.deadlines == {(app.DEFAULT_TEST_ID, 'M1'): now - 10 + 600}
+
+
+def test_session_already_submitted_is_not_stored_twice(store):
+    now = time.time()
+    store.append_result(result_row('M1'))
+    start(store, 'M1', now - 1000)
+    sweeper = app.ExpirySweeper()
+    sweeper.discover()
+
+    sweeper.sweep(now)
+
+    assert store.results_stats()['count'] == 1
+    assert store.list_progress() == []
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import my_lecture_dashboard as app
+
+LABELS = app.OPTION_LABELS + ['']
+
+
+def make_bank(count):
+    rng = np.random.default_rng(7)
+    questions = [
+        {'id': i, 'question': f'Question {i}?', 'options': ['w', 'x', 'y', 'z'],
+         'correct_answer': app.OPTION_LABELS[rng.integers(4)]}
+        for i in range(1, count + 1)
+    ]
+    return app.build_question_bank(questions, 'v1')
+
+
+# Students of varying ability answer `per_paper` random questions each
+def make_sheets(bank, students, per_paper):
+    rng = np.random.default_rng(11)
+    sheets = []
+    for ability in rng.uniform(0.1, 0.9, students):
+        sheet = {}
+        for idx in sorted(rng.choice(len(bank['ids']), per_paper, replace=False)):
+            if rng.random() < 0.1:
+                sheet[bank['ids'][idx]] = ''
+            elif rng.random() < ability:
+                sheet[bank['ids'][idx]] = bank['answer_key'][idx]
+            else:
+                sheet[bank['ids'][idx]] = app.OPTION_LABELS[rng.integers(4)]
+        sheets.append(sheet)
+    return sheets
+
+
+# The textbook definitions, one item and one student at a time
+def naive_analysis(sheets, bank):
+    scores = [sum(answer == bank['answer_key'][bank['id_index'][q_id]] for q_id, answer in sheet.items())
+              for sheet in sheets]
+    items = []
+    for q_id, key in zip(bank['ids'], bank['answer_key']):
+        takers = [(sheet[q_id], score) for sheet, score in zip(sheets, scores) if q_id in sheet]
+        right = np.array([answer == key for answer, _ in takers], dtype=float)
+        rest = np.array([score for _, score in takers], dtype=float) - right
+        items.append({
+            'given_to': len(takers),
+            'p_value': right.mean(),
+            'discrimination': np.corrcoef(right, rest)[0, 1],
+            'choices': [sum(answer == label for answer, _ in takers) / len(takers) for label in LABELS]
+        })
+    return items, scores
+
+
+def test_matches_the_per_item_definitions():
+    bank = make_bank(12)
+    sheets = make_sheets(bank, 80, 8)
+    matrix, on_paper = app.build_answer_matrix(sheets, bank)
+
+    analysis = app.analyze_items(matrix, on_paper, bank)
+
+    items, scores = naive_analysis(sheets, bank)
+    assert analysis['submissions'] == 80
+    assert analysis['mean_score'] == pytest.approx(np.mean(scores))
+    assert analysis['kr20'] is None
+    for j, item in enumerate(items):
+        assert analysis['given_to'][j] == item['given_to']
+        assert analysis['p_values'][j] == pytest.approx(item['p_value'])
+        assert analysis['discrimination'][j] == pytest.approx(item['discrimination'])
+        assert list(analysis['choices'][j]) + [analysis['omitted'][j]] == pytest.approx(item['choices'])
+
+
+def test_kr20_when_everyone_got_the_same_paper():
+    bank = make_bank(10)
+    sheets = make_sheets(bank, 50, 10)
+    matrix, on_paper = app.build_answer_matrix(sheets, bank)
+
+    analysis = app.analyze_items(matrix, on_paper, bank)
+
+    items, scores = naive_analysis(sheets, bank)
+    item_variance = sum(item['p_value'] * (1 - item['p_value']) for item in items)
+    assert analysis['kr20'] == pytest.approx(10 / 9 * (1 - item_variance / np.var(scores)))
@@ -0,0 +1,85 @@
+import my_lecture_dashboard as app
+
+TAGS = ['cells'] * 10 + ['genetics'] * 6 + ['ecology'] * 4
+
+
+def make_bank():
+    questions = [
+        {
+            'id': i,
+            'question': f'Question {i}?',
+            'options': [f'Option {i}{label}' for label in app.OPTION_LABELS],
+            'correct_answer': app.OPTION_LABELS[i % 4],
+            'tag': tag
+        }
+        for i, tag in enumerate(TAGS, start=1)
+    ]
+    return app.build_question_bank(questions, 'v1')
+
+
+def make_test(**settings):
+    return dict(app.new_test('bio101', 'BIO 101'), **settings)
+
+
+# What the student clicks: the displayed option that reads `text`, stored
+# under its bank label as show_test does
+def pick(paper, idx, text):
+    place = [option.split('. ', 1)[1] for option in paper['options_display'][idx]].index(text)
+    order = paper['option_orders'][idx] if paper['option_orders'] else range(len(paper['options_display'][idx]))
+    return app.OPTION_LABELS[list(order)[place]]
+
+
+def correct_text(question):
+    return question['options'][app.OPTION_LABELS.index(question['correct_answer'])]
+
+
+def test_default_settings_give_every_student_the_bank():
+    bank = make_bank()
+    assert app.build_paper(bank, make_test(questions_per_test=0, shuffle_options=False), 'M001') is bank
+
+
+def test_paper_is_stable_per_student():
+    bank = make_bank()
+    test = make_test(questions_per_test=8, stratify_by_tag=False, shuffle_options=True)
+
+    paper = app.build_paper(bank, test, 'M001')
+
+    assert app.build_paper(bank, test, 'M001') == paper
+    assert len(paper['ids']) == len(set(paper['ids'])) == 8
+    assert any(app.build_paper(bank, test, f'M{i:03d}')['ids'] != paper['ids'] for i in range(2, 10))
+
+
+def test_allocate_draws_is_proportional_and_exact():
+    assert app.allocate_draws([10, 6, 4], 10).tolist() == [5, 3, 2]
+    for sizes, count in [([7, 3], 5), ([1, 1, 1], 2), ([5, 9, 2, 1], 11)]:
+        quotas = app.allocate_draws(sizes, count)
+        assert quotas.sum() == count
+        assert all(abs(quota - size * count / sum(sizes)) < 1 for quota, size in zip(quotas, sizes))
+
+
+def test_stratified_paper_draws_every_tag_in_proportion():
+    bank = make_bank()
+    test = make_test(questions_per_test=10, stratify_by_tag=True, shuffle_options=False)
+
+    for matric in ['M001', 'M002', 'M003']:
+        tags = [q['tag'] for q in app.build_paper(bank, test, matric)['questions']]
+        assert {tag: tags.count(tag) for tag in set(tags)} == {'cells': 5, 'genetics': 3, 'ecology': 2}
+
+
+def test_shuffled_options_are_graded_by_bank_label():
+    bank = make_bank()
+    test = make_test(questions_per_test=10, stratify_by_tag=False, shuffle_options=True)
+    paper = app.build_paper(bank, test, 'M001')
+    assert any(order != sorted(order) for order in paper['option_orders'])
+
+    answers = {
+        q_id: pick(paper, idx, correct_text(q))
+        for idx, (q_id, q) in enumerate(zip(paper['ids'], paper['questions']))
+    }
+    assert app.grade_answers(bank, paper, answers) == (10, 10, 100.0)
+
+    first = paper['questions'][0]
+    wrong = next(text for text in first['options'] if text != correct_text(first))
+    answers[paper['ids'][0]] = pick(paper, 0, wrong)
+    del answers[paper['ids'][1]]
+    assert app.grade_answers(bank, paper, answers) == (8, 10, 80.0)
@@ -0,0 +1,53 @@
+import os
+
+
+def start_progress(storage, matric):
+    storage.save_progress(matric, {'student_name': f'Student {matric}', 'answers': {}, 'test_started': True})
+
+
+def append_raw(storage, matric, data):
+    with open(storage.get_progress_journal(matric), 'ab') as f:
+        f.write(data)
+
+
+def test_replay_applies_entries_in_order_and_skips_a_torn_last_line(file_storage):
+    start_progress(file_storage, 'A1')
+    for q_id, answer in [('1', 'A'), ('2', 'B'), ('1', 'C')]:
+        file_storage.record_answer('A1', q_id, answer)
+    append_raw(file_storage, 'A1', b'{"q": "3", "a": "D')
+
+    assert file_storage.load_progress('A1')['answers'] == {'1': 'C', '2': 'B'}
+    summary, = file_storage.progress_summaries()
+    assert summary['answered'] == 2
+
+
+def test_snapshot_folds_in_the_journal(file_storage):
+    start_progress(file_storage, 'A1')
+    file_storage.record_answer('A1', '1', 'A')
+    data = file_storage.load_progress('A1')
+
+    file_storage.save_progress('A1', data)
+
+    assert not os.path.exists(file_storage.get_progress_journal('A1'))
+    assert file_storage.load_progress('A1')['answers'] == {'1': 'A'}
+
+
+def test_answer_after_a_torn_entry_is_kept(file_storage):
+    start_progress(file_storage, 'A1')
+    file_storage.record_answer('A1', '1', 'A')
+    append_raw(file_storage, 'A1', b'{"q": "2", "a"')
+
+    file_storage.record_answer('A1', '3', 'C')
+
+    assert file_storage.load_progress('A1')['answers'] == {'1': 'A', '3': 'C'}
+    summary, = file_storage.progress_summaries()
+    assert summary['answered'] == 2
+
+
+def test_complete_entry_without_a_newline_is_kept(file_storage):
+    start_progress(file_storage, 'A1')
+    append_raw(file_storage, 'A1', b'{"q": "1", "a": "B"}')
+
+    file_storage.record_answer('A1', '2', 'D')
+
+    assert file_storage.load_progress('A1')['answers'] == {'1': 'B', '2': 'D'}
@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+import my_lecture_dashboard as app
+
+HEADER = 'id,question,option_a,option_b,option_c,option_d,correct_answer,tag\n'
+
+
+def upload(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def test_csv_row_is_normalized():
+    q = app.parse_question_record({
+        'id': ' 7 ', 'question': ' What is ATP? ', 'option_a': 'Energy ', 'option_b': 'Sugar',
+        'option_c': '', 'option_d': None, 'correct_answer': 'b', 'tag': 'cells'
+    })
+    assert q == {'id': 7, 'question': 'What is ATP?', 'options': ['Energy', 'Sugar'],
+                 'correct_answer': 'B', 'tag': 'cells'}
+
+
+@pytest.mark.parametrize('record, error', [
+    ({'question': 'Q?', 'options': ['a', 'b'], 'correct_answer': 'A'}, 'Missing id'),
+    ({'id': 1, 'question': '  ', 'options': ['a', 'b'], 'correct_answer': 'A'}, 'Missing question'),
+    ({'id': 1, 'question': 'Q?', 'options': 'a,b', 'correct_answer': 'A'}, 'must be a list'),
+    ({'id': 1, 'question': 'Q?', 'options': ['a'], 'correct_answer': 'A'}, 'got 1'),
+    ({'id': 1, 'question': 'Q?', 'option_a': 'a', 'option_c': 'c', 'correct_answer': 'A'}, 'blank'),
+    ({'id': 1, 'question': 'Q?', 'options': ['a', 'b', 'c'], 'correct_answer': 'D'}, 'one of A, B, C'),
+    ({'id': 1, 'question': 'Q?', 'options': ['a', 'b']}, 'one of A, B'),
+    ('["not", "an", "object"]', 'Expected an object'),
+    ('{"id": 1, "question": ', 'Expecting value'),
+])
+def test_bad_record_is_rejected(record, error):
+    with pytest.raises(ValueError, match=error):
+        app.parse_question_record(record)
+
+
+def test_csv_reports_bad_rows_by_line_and_keeps_the_rest():
+    text = (HEADER
+            + '1,First?,a,b,,,A,\n'
+            + ',No id?,a,b,,,A,\n'
+            + ',,,,,,,\n'
+            + '2,Second?,a,b,c,,C,genetics\n'
+            + '3,Third?,a,,,,A,\n'
+            + '1,First again?,a,b,,,B,\n')
+
+    result = app.read_question_file(upload(text), 'csv')
+
+    assert result['rows'] == 5
+    assert [q['question'] for q in result['questions']] == ['First again?', 'Second?']
+    assert result['errors'] == [{'Row': 3, 'Error': 'Missing id'},
+                                {'Row': 6, 'Error': 'Expected 2 to 4 options, got 1'}]
+    assert result['error_count'] == 2
+
+
+def test_json_lines_skips_unparseable_lines():
+    lines = [json.dumps({'id': 1, 'question': 'Q1?', 'options': ['a', 'b'], 'correct_answer': 'A'}),
+             '{"id": 2, "question": "Q2?", "options": ["a", "b"]',
+             '',
+             json.dumps({'id': 3, 'question': 'Q3?', 'options': ['a', 'b'], 'correct_answer': 'B'})]
+
+    result = app.read_question_file(upload('\n'.join(lines) + '\n'), 'jsonl')
+
+    assert [q['id'] for q in result['questions']] == [1, 3]
+    assert [error['Row'] for error in result['errors']] == [2]
+
+
+def test_only_the_first_errors_are_kept(monkeypatch):
+    monkeypatch.setattr(app, 'IMPORT_ERRORS_SHOWN', 2)
+    text = HEADER + ''.join(f'{i},,a,b,,,A,\n' for i in range(1, 6))
+
+    result = app.read_question_file(upload(text), 'csv')
+
+    assert result['questions'] == []
+    assert [error['Row'] for error in result['errors']] == [2, 3]
+    assert result['error_count'] == 5
+
+
+def test_json_that_is_not_an_array_is_rejected():
+    with pytest.raises(ValueError, match='array'):
+        app.read_question_file(upload('{"id": 1}'), 'json')
@@ -0,0 +1,59 @@
+import os
+from datetime import date
+
+import pytest
+
+import my_lecture_dashboard as app
+from conftest import result_row
+
+pytest.importorskip('pyarrow')
+
+
+def test_compaction_with_nothing_old_enough_leaves_the_log_alone(file_storage):
+    file_storage.append_result(result_row('A1', '2024-03-01 09:00:00'))
+    file_storage.append_result(result_row('A2', '2024-03-02 09:00:00'))
+    before = os.stat(file_storage.results_file)
+
+    assert file_storage.compact_results(date(2024, 3, 1)) == 0
+
+    after = os.stat(file_storage.results_file)
+    assert (after.st_mtime_ns, after.st_size) == (before.st_mtime_ns, before.st_size)
+    assert not os.path.exists(file_storage.archive.manifest_file)
+
+
+def test_unparseable_first_timestamp_does_not_block_compaction(file_storage):
+    file_storage.append_result(result_row('G1', 'not a timestamp'))
+    file_storage.append_result(result_row('A1', '2024-01-01 09:00:00'))
+    file_storage.append_result(result_row('A2', '2024-03-02 09:00:00'))
+
+    assert file_storage.compact_results(date(2024, 2, 1)) == 1
+
+    assert [part['date'] for part in file_storage.archive_partitions()] == ['2024-01-01']
+    assert all(file_storage.has_taken_test(matric) for matric in ['G1', 'A1', 'A2'])
+
+
+def test_sweeper_waits_an_interval_before_its_first_archive_check(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, 'results_archive_available', lambda: True)
+    monkeypatch.setattr(app, 'load_tests', lambda: [{'id': app.DEFAULT_TEST_ID}])
+    monkeypatch.setattr(app, 'compact_results', lambda test_id, before: calls.append(before) or 0)
+    sweeper = app.ExpirySweeper()
+
+    sweeper.archive_results(sweeper.archived_at + 1)
+    assert calls == []
+
+    sweeper.archive_results(sweeper.archived_at + app.RESULTS_ARCHIVE_CHECK_SECONDS)
+    assert len(calls) == 1
+
+
+def test_archived_times_stay_whole_seconds(file_storage):
+    file_storage.append_result(result_row('A1', '2024-01-01 09:00:00'))
+    file_storage.append_result(result_row('A2', '2024-03-02 09:00:00'))
+
+    file_storage.compact_results(date(2024, 2, 1))
+
+    df = file_storage.load_results()
+    assert [str(value) for value in df['Time Taken (seconds)']] == ['60', '60']
+    page, total = file_storage.query_results({}, 'Timestamp', True, 0, 10)
+    assert total == 2
+    assert [str(value) for value in page['Time Taken (seconds)']] == ['60', '60']
@@ -0,0 +1,68 @@
+import os
+
+import my_lecture_dashboard as app
+from conftest import open_file_storage, result_row
+
+
+def scanned_from(storage, monkeypatch):
+    starts = []
+    scan = storage.scan_results_rows
+
+    def spy(f, columns, matrics, stats):
+        starts.append(f.tell())
+        return scan(f, columns, matrics, stats)
+
+    monkeypatch.setattr(storage, 'scan_results_rows', spy)
+    return starts
+
+
+def test_rows_appended_elsewhere_are_indexed_from_the_last_offset(tmp_path, monkeypatch):
+    ours = open_file_storage(str(tmp_path))
+    theirs = open_file_storage(str(tmp_path))
+    for i in range(5):
+        ours.append_result(result_row(f'A{i}'))
+    assert ours.has_taken_test('A0')
+    indexed = os.path.getsize(ours.results_file)
+    starts = scanned_from(ours, monkeypatch)
+
+    theirs.append_result(result_row('B1', percentage=100.0, time_taken=30))
+
+    assert ours.append_result(result_row('A9'), unique=True)
+    assert not ours.append_result(result_row('B1'), unique=True)
+    assert starts == [indexed]
+    stats = ours.results_stats()
+    assert stats['count'] == 7
+    assert stats['percentage_sum'] == 6 * 50.0 + 100.0
+    assert stats['time_sum'] == 6 * 60 + 30
+    assert ours.results_index['offset'] == os.path.getsize(ours.results_file)
+
+
+def test_rewritten_log_is_rescanned(tmp_path):
+    ours = open_file_storage(str(tmp_path))
+    theirs = open_file_storage(str(tmp_path))
+    for i in range(3):
+        ours.append_result(result_row(f'A{i}'))
+    assert ours.has_taken_test('A2')
+
+    theirs.clear_results()
+    for i in range(10):
+        theirs.append_result(result_row(f'B{i}'))
+
+    assert not ours.has_taken_test('A2')
+    assert ours.has_taken_test('B9')
+    assert ours.results_stats()['count'] == 10
+
+
+def test_log_ending_mid_row_falls_back_to_a_rescan(tmp_path):
+    ours = open_file_storage(str(tmp_path))
+    ours.append_result(result_row('A1'))
+    with open(ours.results_file, 'ab') as f:
+        f.write(app.format_csv_row(result_row('H1')).rstrip('\n').encode('utf-8'))
+    assert ours.has_taken_test('H1')
+    assert ours.results_index['offset'] is None
+
+    theirs = open_file_storage(str(tmp_path))
+    theirs.append_result(result_row('B1'))
+
+    assert ours.has_taken_test('B1')
+    assert ours.results_stats()['count'] == 3
@@ -0,0 +1,70 @@
+import pytest
+
+import my_lecture_dashboard as app
+from conftest import open_file_storage, result_row
+
+
+# The log is plain CSV, so it must work without pyarrow installed too
+@pytest.fixture(params=['pyarrow', 'without-pyarrow'])
+def file_storage(request, tmp_path):
+    if request.param == 'without-pyarrow':
+        request.getfixturevalue('without_pyarrow')
+    return open_file_storage(str(tmp_path))
+
+
+def append_raw(storage, data):
+    with open(storage.results_file, 'ab') as f:
+        f.write(data)
+
+
+def read_rows(storage):
+    with open(storage.results_file, 'rb') as f:
+        return f.read().split(b'\n')
+
+
+def test_torn_row_is_dropped_before_the_next_append(file_storage):
+    file_storage.append_result(result_row('A1'))
+    append_raw(file_storage, b'2024-01-01 10:05:00,Torn Student,T1,5,1')
+
+    assert file_storage.append_result(result_row('A2'), unique=True)
+
+    assert file_storage.has_taken_test('A1')
+    assert file_storage.has_taken_test('A2')
+    assert not file_storage.has_taken_test('T1')
+    assert file_storage.results_stats()['count'] == 2
+    assert not any(b'Torn Student' in line for line in read_rows(file_storage))
+
+
+def test_torn_quoted_answers_are_dropped(file_storage):
+    file_storage.append_result(result_row('A1'))
+    append_raw(file_storage, b'2024-01-01 10:05:00,Torn,T1,5,10,50.0,60,"{""1"":""A')
+
+    file_storage.append_result(result_row('A2'))
+
+    assert not file_storage.has_taken_test('T1')
+    assert file_storage.results_stats()['count'] == 2
+
+
+def test_complete_row_without_trailing_newline_is_kept(file_storage):
+    file_storage.append_result(result_row('A1'))
+    append_raw(file_storage, app.format_csv_row(result_row('H1')).rstrip('\n').encode('utf-8'))
+    file_storage.invalidate_results_index()
+    assert file_storage.has_taken_test('H1')
+
+    assert file_storage.append_result(result_row('A2'), unique=True)
+
+    assert file_storage.has_taken_test('H1')
+    assert file_storage.has_taken_test('A2')
+    assert not file_storage.append_result(result_row('H1'), unique=True)
+    assert file_storage.results_stats()['count'] == 3
+    assert len(file_storage.load_results()) == 3
+
+
+def test_header_without_trailing_newline_is_kept(file_storage):
+    with open(file_storage.results_file, 'wb') as f:
+        f.write(app.format_csv_row(app.RESULTS_COLUMNS).rstrip('\n').encode('utf-8'))
+
+    file_storage.append_result(result_row('A1'))
+
+    assert list(file_storage.load_results().columns) == app.RESULTS_COLUMNS
+    assert file_storage.has_taken_test('A1')
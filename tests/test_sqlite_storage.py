@@ -0,0 +1,35 @@
+import threading
+
+from conftest import open_sqlite_storage, result_row
+
+
+def run_in_thread(fn):
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+
+
+def test_connections_are_reused_across_threads(tmp_path):
+    storage = open_sqlite_storage(str(tmp_path))
+    pooled = list(storage.pool)
+
+    # Each Streamlit rerun is a new thread
+    for i in range(5):
+        run_in_thread(lambda: storage.append_result(result_row(f'A{i}')))
+        run_in_thread(lambda: storage.has_taken_test(f'A{i}'))
+
+    assert storage.pool == pooled
+    assert storage.results_stats()['count'] == 5
+
+
+def test_abandoned_chunk_reader_returns_its_connection(tmp_path):
+    storage = open_sqlite_storage(str(tmp_path))
+    for i in range(3):
+        storage.append_result(result_row(f'A{i}'))
+
+    chunks = storage.iter_results_chunks(chunksize=1)
+    next(chunks)
+    assert storage.pool == []
+    chunks.close()
+
+    assert len(storage.pool) == 1
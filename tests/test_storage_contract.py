@@ -0,0 +1,187 @@
+"""The results contract every Storage backend must honour, run against both."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+import my_lecture_dashboard as app
+from conftest import result_row
+
+DAYS = ['2024-01-05', '2024-01-20', '2024-02-10', '2024-03-01']
+
+
+# Row i of the seeded log: spread over DAYS, scored i % 11 out of 10
+def numbered_row(i, answers=None):
+    return result_row(
+        f'M{i:03d}',
+        timestamp=f'{DAYS[min(i * len(DAYS) // 40, len(DAYS) - 1)]} 10:{i // 60:02d}:{i % 60:02d}',
+        score=i % 11,
+        percentage=i % 11 * 10.0,
+        time_taken=60 + i,
+        answers=answers
+    )
+
+
+def answers_for(i):
+    return {str(q): 'A' if (i + q) % 3 == 0 else 'B' for q in range(1, 11)}
+
+
+def seed(storage, count=40):
+    for i in range(count):
+        assert storage.append_result(numbered_row(i, answers_for(i)))
+
+
+# Score = answers marked 'A'
+def grade_by_a(sheets):
+    scores = np.array([sum(answer == 'A' for answer in sheet.values()) for sheet in sheets])
+    totals = np.array([len(sheet) for sheet in sheets])
+    return scores, totals, scores * 100.0 / totals
+
+
+def matrics(df):
+    return [str(matric) for matric in df['Matric Number']]
+
+
+def assert_stats_match_rows(storage):
+    df = storage.load_results()
+    percentages = df['Percentage'].astype(float)
+    stats = storage.results_stats()
+    assert stats['count'] == len(df)
+    assert stats['percentage_sum'] == pytest.approx(percentages.sum())
+    assert stats['time_sum'] == pytest.approx(df['Time Taken (seconds)'].astype(float).sum())
+    assert stats['histogram'] == np.bincount(percentages.astype(int), minlength=101).tolist()
+
+
+def test_append_and_unique(storage):
+    assert storage.append_result(numbered_row(1))
+    assert storage.has_taken_test('M001')
+    assert not storage.has_taken_test('M002')
+
+    assert not storage.append_result(numbered_row(1), unique=True)
+    assert storage.append_result(numbered_row(2), unique=True)
+    assert storage.append_result(numbered_row(1))
+
+    assert matrics(storage.load_results()) == ['M001', 'M002', 'M001']
+
+
+def test_index_sees_appends_from_another_handle(open_storage):
+    ours, theirs = open_storage(), open_storage()
+    seed(ours, 10)
+    assert_stats_match_rows(ours)
+
+    theirs.append_result(numbered_row(20))
+    theirs.append_result(numbered_row(21))
+
+    assert ours.has_taken_test('M020')
+    assert not ours.append_result(numbered_row(21), unique=True)
+    assert_stats_match_rows(ours)
+    assert ours.results_stats()['count'] == 12
+
+
+def test_index_sees_rewrites_from_another_handle(open_storage):
+    ours, theirs = open_storage(), open_storage()
+    seed(ours, 10)
+    assert ours.has_taken_test('M005')
+
+    theirs.clear_results()
+    theirs.append_result(numbered_row(30))
+
+    assert not ours.has_taken_test('M005')
+    assert ours.has_taken_test('M030')
+    assert ours.results_stats()['count'] == 1
+
+
+def test_query_results_pages(storage):
+    seed(storage)
+
+    page, total = storage.query_results({}, 'Timestamp', False, 0, 15)
+    assert total == 40
+    assert matrics(page) == [f'M{i:03d}' for i in range(39, 24, -1)]
+    page, total = storage.query_results({}, 'Timestamp', False, 2, 15)
+    assert matrics(page) == [f'M{i:03d}' for i in range(9, -1, -1)]
+    page, total = storage.query_results({}, 'Timestamp', True, 1, 15)
+    assert matrics(page) == [f'M{i:03d}' for i in range(15, 30)]
+    assert list(page.columns) == app.RESULTS_TABLE_COLUMNS
+
+
+def test_query_results_filters_and_sorting(storage):
+    seed(storage)
+
+    page, total = storage.query_results({'matric': 'm01'}, 'Timestamp', True, 0, 50)
+    assert matrics(page) == [f'M{i:03d}' for i in range(10, 20)]
+    page, total = storage.query_results({'name': 'student m03'}, 'Timestamp', True, 0, 50)
+    assert matrics(page) == [f'M{i:03d}' for i in range(30, 40)]
+    filters = {'date_from': date(2024, 1, 20), 'date_to': date(2024, 2, 10)}
+    page, total = storage.query_results(filters, 'Timestamp', True, 0, 50)
+    assert matrics(page) == [f'M{i:03d}' for i in range(10, 30)]
+    page, total = storage.query_results({'score_band': (80, 100)}, 'Percentage', False, 0, 50)
+    assert total == len([i for i in range(40) if i % 11 >= 8])
+    assert list(page['Percentage'].astype(float)) == sorted(page['Percentage'].astype(float), reverse=True)
+
+
+def test_update_scores(storage):
+    seed(storage, 20)
+    storage.append_result(numbered_row(90))
+
+    regraded, changed = storage.update_scores(grade_by_a)
+
+    expected = {f'M{i:03d}': grade_by_a([answers_for(i)])[0][0] for i in range(20)}
+    df = storage.load_results()
+    assert regraded == 20
+    assert changed == sum(1 for i in range(20) if i % 11 != expected[f'M{i:03d}'])
+    for matric, score in zip(matrics(df), df['Score']):
+        assert int(score) == expected.get(matric, 90 % 11)
+    assert_stats_match_rows(storage)
+
+
+QUERIES = [
+    ({}, 'Timestamp', False, 1),
+    ({}, 'Timestamp', True, 2),
+    ({'date_from': date(2024, 1, 20), 'date_to': date(2024, 1, 20)}, 'Percentage', True, 0),
+    ({'score_band': (30, 70)}, 'Student Name', False, 1)
+]
+
+
+def query_pages(storage):
+    return [storage.query_results(filters, sort_by, ascending, page, 7)[0].astype(str).values.tolist()
+            for filters, sort_by, ascending, page in QUERIES]
+
+
+def test_reads_after_compaction(storage):
+    if isinstance(storage, app.FileStorage):
+        pytest.importorskip('pyarrow')
+    seed(storage)
+    before = {
+        'stats': storage.results_stats(),
+        'load': storage.load_results().astype(str).values.tolist(),
+        'pages': query_pages(storage)
+    }
+
+    moved = storage.compact_results(date(2024, 2, 1))
+
+    assert moved == (20 if isinstance(storage, app.FileStorage) else 0)
+    storage.invalidate_results_index()
+    assert storage.results_stats() == before['stats']
+    assert storage.load_results().astype(str).values.tolist() == before['load']
+    assert query_pages(storage) == before['pages']
+    assert all(storage.has_taken_test(f'M{i:03d}') for i in range(40))
+    assert not storage.append_result(numbered_row(3), unique=True)
+
+    storage.append_result(numbered_row(50, answers_for(50)))
+    regraded, _ = storage.update_scores(grade_by_a)
+    assert regraded == 41
+    assert_stats_match_rows(storage)
+
+    storage.clear_results()
+    assert storage.results_stats()['count'] == 0
+    assert not storage.has_taken_test('M001')
+    assert storage.archive_partitions() == []
+
+
+def test_incomplete_backend_fails_when_created():
+    class ResultsOnly(app.Storage):
+        def append_result(self, row, unique=False):
+            return True
+
+    with pytest.raises(TypeError, match='abstract'):
+        ResultsOnly()
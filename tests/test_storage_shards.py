@@ -0,0 +1,27 @@
+import os
+
+import my_lecture_dashboard as app
+from conftest import result_row
+
+
+def test_shards_live_outside_the_test_suite(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    storage = app.open_storage('bio101', 'file')
+
+    assert os.path.dirname(storage.results_file) == os.path.join(app.TESTS_DIR, 'bio101')
+    assert not os.path.exists(app.LEGACY_TESTS_DIR)
+
+
+def test_legacy_shard_is_moved_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy = os.path.join(app.LEGACY_TESTS_DIR, 'bio101')
+    os.makedirs(legacy)
+    with open(os.path.join(legacy, app.RESULTS_FILE), 'w', encoding='utf-8') as f:
+        f.write(app.format_csv_row(app.RESULTS_COLUMNS))
+        f.write(app.format_csv_row(result_row('OLD1')))
+
+    storage = app.open_storage('bio101', 'file')
+
+    assert storage.has_taken_test('OLD1')
+    assert not os.path.exists(legacy)